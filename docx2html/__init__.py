@@ -1,7 +1,19 @@
-from docx2html.core import convert
+from docx2html.batch import convert_many
+from docx2html.core import (
+    convert,
+    convert_bytes,
+    convert_fileobj,
+    convert_iter,
+    convert_to_stream,
+)
 
 __all__ = [
     convert.func_name,
+    convert_bytes.func_name,
+    convert_fileobj.func_name,
+    convert_iter.func_name,
+    convert_many.func_name,
+    convert_to_stream.func_name,
 ]
 
 # Edit here and setup.py
@@ -0,0 +1,177 @@
+"""
+Convert documents without blocking the caller.
+
+docx2html runs on Python 2, which does not have asyncio, so instead of
+coroutines these hand back the ``AsyncResult`` of the conversion from an
+``executor``, a ``multiprocessing.pool.ThreadPool`` or ``multiprocessing.Pool``
+(anything with an ``apply_async``). Wait for it with ``get`` or pass in a
+``callback`` to be called with the html, which is how an event loop can pick up
+the result.
+
+Everything in the conversion runs in the ``executor``, including the
+``converter`` (abiword for example), so the caller is never blocked by it.
+
+The ``image_handler`` can hand back an ``AsyncResult`` as well (from uploading
+the image in another pool for example), the rest of the document is converted
+while it is being worked on and the src is filled in at the end.
+"""
+import threading
+from collections import deque
+from multiprocessing import TimeoutError
+
+from docx2html.core import convert as _convert
+
+
+def _convert_with_outcome(file_path, options):
+    # The callback of ``apply_async`` is only called when the function
+    # returns, so the exception is handed back as well.
+    try:
+        return True, _convert(file_path, **options)
+    except Exception as e:
+        return False, e
+
+
+class LimitedResult(object):
+    """
+    The result of a conversion handed to ``convert`` with a ``Limiter``, it
+    works the same way as an ``AsyncResult``.
+    """
+
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._event = threading.Event()
+        self._success = None
+        self._value = None
+
+    def ready(self):
+        return self._event.is_set()
+
+    def successful(self):
+        assert self.ready()
+        return self._success
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+
+    def get(self, timeout=None):
+        self.wait(timeout)
+        if not self.ready():
+            raise TimeoutError
+        if self._success:
+            return self._value
+        raise self._value
+
+    def _set(self, success, value):
+        self._success = success
+        self._value = value
+        if success and self._callback is not None:
+            self._callback(value)
+        self._event.set()
+
+
+class Limiter(object):
+    """
+    Limits how many documents are converted at a time to ``limit``, for an
+    ``executor`` that is bigger than that because it is also used to wait on
+    other things. One ``Limiter`` is shared by all of the calls to ``convert``
+    it should limit.
+
+    Documents past the limit wait in the ``Limiter``, not in the
+    ``executor``. Each one is handed to the ``executor`` once another
+    conversion has finished. So they do not hold any of its workers, and
+    anything handed to it in the mean time is not stuck behind them.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = deque()
+
+    def convert(self, file_path, executor, callback, options):
+        result = LimitedResult(callback)
+        task = (file_path, executor, options, result)
+        with self._lock:
+            start = self._running < self.limit
+            if start:
+                self._running += 1
+            else:
+                self._waiting.append(task)
+        if start and not self._start(*task):
+            self._finish()
+        return result
+
+    def _start(self, file_path, executor, options, result):
+        """
+        Hand ``file_path`` to ``executor``. Returns False if it could not be
+        (the ``executor`` has been closed for example), ``result`` then has
+        the exception.
+        """
+        def done(outcome):
+            self._finish()
+            result._set(*outcome)
+        try:
+            executor.apply_async(
+                _convert_with_outcome,
+                (file_path, options),
+                callback=done,
+            )
+        except Exception as e:
+            result._set(False, e)
+            return False
+        return True
+
+    def _finish(self):
+        # Runs in the thread that calls the callbacks of the ``executor``
+        # once a conversion is done, the next document is handed over right
+        # away.
+        while True:
+            with self._lock:
+                if not self._waiting:
+                    self._running -= 1
+                    return
+                task = self._waiting.popleft()
+            if self._start(*task):
+                return
+
+
+def convert(file_path, executor, limiter=None, callback=None, **options):
+    """
+    Convert ``file_path`` in ``executor`` and return the ``AsyncResult`` of
+    the html. ``callback`` is called with the html once it is done.
+
+    ``limiter`` (a ``Limiter``) limits how many documents are converted at a
+    time, a ``LimitedResult`` is returned instead.
+
+    Everything else is passed along to ``docx2html.convert``.
+    """
+    if limiter is not None:
+        return limiter.convert(file_path, executor, callback, options)
+    return executor.apply_async(
+        _convert,
+        (file_path,),
+        options,
+        callback=callback,
+    )
+
+
+def convert_many(
+        file_paths,
+        executor,
+        limiter=None,
+        callback=None,
+        **options):
+    """
+    The same as ``convert`` for each of ``file_paths``. Returns a list of the
+    ``AsyncResult`` for each file, in the same order as ``file_paths``.
+    """
+    return [
+        convert(
+            file_path,
+            executor,
+            limiter=limiter,
+            callback=callback,
+            **options
+        )
+        for file_path in file_paths
+    ]
@@ -0,0 +1,173 @@
+"""
+Convert a lot of documents at once, spread out over a pool of processes (or
+threads).
+"""
+import cPickle
+import multiprocessing
+import Queue
+import traceback
+from collections import deque, namedtuple
+from multiprocessing.pool import ThreadPool
+
+from PIL import Image
+
+from docx2html.core import convert
+from docx2html.exceptions import WorkerException
+
+ConversionResult = namedtuple(
+    'ConversionResult',
+    [
+        'file_path',
+        'html',
+        'exception',
+    ],
+)
+
+# The options ``convert`` is called with in this worker process.
+_worker_options = {}
+
+
+def _init_worker(options, initializer, initargs):
+    _worker_options.clear()
+    _worker_options.update(options)
+    # Load all of the PIL plugins once, instead of in every conversion that
+    # has an image PIL has not seen yet.
+    Image.init()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _init_thread(initializer, initargs):
+    Image.init()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _get_picklable_exception(e, traceback_text):
+    """
+    Returns ``e`` if it can be pickled and unpickled, otherwise a
+    ``WorkerException`` for it. The pool gives up on results it can not
+    unpickle, and then never hands back anything else.
+    """
+    try:
+        cPickle.loads(cPickle.dumps(e, cPickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return WorkerException(type(e).__name__, str(e), traceback_text)
+    return e
+
+
+def _convert(file_path, options=None):
+    in_process = options is None
+    if in_process:
+        options = _worker_options
+    try:
+        html = convert(file_path, **options)
+    except Exception as e:
+        if in_process:
+            # The result is pickled to send it back from the worker process.
+            e = _get_picklable_exception(e, traceback.format_exc())
+        return ConversionResult(file_path=file_path, html=None, exception=e)
+    return ConversionResult(file_path=file_path, html=html, exception=None)
+
+
+def _iter_ordered(pool, file_paths, max_in_flight, options):
+    in_flight = deque()
+    for file_path in file_paths:
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().get()
+        in_flight.append(pool.apply_async(_convert, (file_path, options)))
+    while in_flight:
+        yield in_flight.popleft().get()
+
+
+def _iter_unordered(pool, file_paths, max_in_flight, options):
+    done = Queue.Queue()
+    in_flight = 0
+    for file_path in file_paths:
+        if in_flight >= max_in_flight:
+            yield done.get()
+            in_flight -= 1
+        pool.apply_async(
+            _convert,
+            (file_path, options),
+            callback=done.put,
+        )
+        in_flight += 1
+    while in_flight:
+        yield done.get()
+        in_flight -= 1
+
+
+def convert_many(
+        file_paths,
+        workers=None,
+        ordered=True,
+        max_in_flight=None,
+        initializer=None,
+        initargs=(),
+        threads=False,
+        **options):
+    """
+    Convert each of ``file_paths`` (any iterable) with ``convert`` in a pool
+    of ``workers`` processes (one per cpu by default). Yields a
+    ``ConversionResult`` for each file, with either the html or the exception
+    converting it raised (like ``MalformedDocx`` or ``ConversionFailed``).
+    An exception that can not be sent back from a worker process is handed
+    back as a ``WorkerException`` instead.
+
+    ``ordered`` if True the results are yielded in the same order as
+        ``file_paths``, otherwise they are yielded as soon as they are done.
+    ``max_in_flight`` is how many files can be waiting to be converted or have
+        a result waiting to be yielded at a time (twice the number of
+        ``workers`` by default), ``file_paths`` is only read that far ahead.
+    ``initializer`` is called with ``initargs`` once in each worker process
+        when it starts.
+    ``threads`` if True the workers are threads in this process instead.
+        Nothing about a conversion is shared between documents, so they can
+        run at the same time. Much of the work holds the GIL, so this mostly
+        helps when the conversions wait on something (a ``converter`` or an
+        ``image_handler`` that uploads the images for example).
+
+    Everything else is passed along to ``convert``, so it needs to be
+    picklable (the ``image_handler`` needs to be a module level function for
+    example), unless ``threads`` is True.
+
+    Each worker process is reused for many files, so the expensive set up
+    (importing docx2html, compiling the XPath expressions, loading the PIL
+    plugins) is only done once per process.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if max_in_flight is None:
+        max_in_flight = workers * 2
+    if threads:
+        pool = ThreadPool(workers, _init_thread, (initializer, initargs))
+        task_options = options
+    else:
+        pool = multiprocessing.Pool(
+            workers,
+            _init_worker,
+            (options, initializer, initargs),
+        )
+        # The options were handed to each worker process when it started.
+        task_options = None
+    try:
+        if ordered:
+            results = _iter_ordered(
+                pool,
+                file_paths,
+                max_in_flight,
+                task_options,
+            )
+        else:
+            results = _iter_unordered(
+                pool,
+                file_paths,
+                max_in_flight,
+                task_options,
+            )
+        for result in results:
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,40 @@
+"""
+Benchmarks for docx2html.
+
+These are not part of the test suite, they exist so that changes to the
+conversion pipeline can be checked for how they perform and scale. Run all of
+them with::
+
+    $ python -m docx2html.benchmarks
+
+or a single one with (for example)::
+
+    $ python -m docx2html.benchmarks.xpath
+
+``throughput`` converts the large synthetic documents from ``generators``
+and saves its results as json, pass ``--output`` and ``--compare`` to check a
+change against them.
+
+The documents are generated with the ``DocxBuilder`` from the test suite, so
+the test requirements need to be installed.
+"""
+from docx2html.core import MetaData
+from docx2html.tests import (
+    DEFAULT_FONT_SIZES_DICT,
+    DEFAULT_IMAGE_SIZES,
+    DEFAULT_NUMBERING_DICT,
+    DEFAULT_RELATIONSHIP_DICT,
+    DEFAULT_STYLES_DICT,
+    image_handler,
+)
+
+
+def get_meta_data():
+    return MetaData(
+        numbering_dict=DEFAULT_NUMBERING_DICT,
+        relationship_dict=DEFAULT_RELATIONSHIP_DICT,
+        styles_dict=DEFAULT_STYLES_DICT,
+        font_sizes_dict=DEFAULT_FONT_SIZES_DICT,
+        image_handler=image_handler,
+        image_sizes=DEFAULT_IMAGE_SIZES,
+    )
@@ -0,0 +1,9 @@
+from docx2html.benchmarks import scaling, serialize, throughput, xpath
+
+for module in (scaling, xpath, serialize):
+    print module.__name__
+    module.main()
+    print
+
+print throughput.__name__
+throughput.main(['--sizes', '500,2000', '--repeat', '1'])
@@ -0,0 +1,225 @@
+"""
+Synthetic documents that can be made as large as needed.
+
+Each generator returns a ``Document``, the xml for word/document.xml along with
+the hyperlinks and images it uses, ``write_docx`` turns one into a docx that
+``convert`` can open.
+"""
+from collections import namedtuple
+from contextlib import closing
+from io import BytesIO
+from itertools import cycle
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from PIL import Image
+
+from docx2html.tests.document_builder import DocxBuilder as DXB
+
+Document = namedtuple(
+    'Document',
+    [
+        'xml',
+        # A dict of the target of each hyperlink keyed by relationship id.
+        'hyperlinks',
+        # A dict of the name of each image in word/media keyed by
+        # relationship id.
+        'images',
+        # The number of paragraphs (p tags) in the document.
+        'num_paragraphs',
+    ],
+)
+
+SENTENCE = 'Paragraph number %d has more than eight words in it.'
+
+NUMBERING_XML = '''<?xml version="1.0"?>
+<w:numbering
+    xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+  <w:abstractNum w:abstractNumId="0">%s</w:abstractNum>
+  <w:abstractNum w:abstractNumId="1">%s</w:abstractNum>
+  <w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>
+  <w:num w:numId="2"><w:abstractNumId w:val="1"/></w:num>
+</w:numbering>
+''' % (
+    ''.join(
+        '<w:lvl w:ilvl="%d"><w:numFmt w:val="decimal"/></w:lvl>' % i
+        for i in range(9)
+    ),
+    ''.join(
+        '<w:lvl w:ilvl="%d"><w:numFmt w:val="bullet"/></w:lvl>' % i
+        for i in range(9)
+    ),
+)
+
+RELATIONSHIPS_XML = '''<?xml version="1.0"?>
+<Relationships
+    xmlns="http://schemas.openxmlformats.org/package/2006/relationships">%s
+</Relationships>
+'''
+RELATIONSHIP = '<Relationship Id="%s" Type="%s" Target="%s"%s/>'
+HYPERLINK_TYPE = (
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'hyperlink'
+)
+IMAGE_TYPE = (
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'image'
+)
+
+
+def _document(body, num_paragraphs, hyperlinks=None, images=None):
+    return Document(
+        xml=DXB.xml('<w:body>%s</w:body>' % ''.join(body)),
+        hyperlinks=hyperlinks or {},
+        images=images or {},
+        num_paragraphs=num_paragraphs,
+    )
+
+
+def paragraphs(size):
+    """
+    ``size`` plain paragraphs.
+    """
+    body = [DXB.p_tag(SENTENCE % i) for i in range(size)]
+    return _document(body, size)
+
+
+def nested_lists(size, depth=6):
+    """
+    Lists with ``size`` items in total, each one going ``depth`` levels deep
+    and back out again, with the two list types alternating.
+    """
+    levels = range(depth) + range(depth - 2, 0, -1)
+    body = []
+    for i, ilvl in zip(range(size), cycle(levels)):
+        numId = (i // 50) % 2 + 1
+        body.append(DXB.li(text=SENTENCE % i, ilvl=ilvl, numId=numId))
+    return _document(body, size)
+
+
+def merged_tables(size, num_columns=8, num_rows=50):
+    """
+    Tables of ``num_rows`` by ``num_columns`` with ``size`` cells in total.
+    Every other row spans its first two columns and the third column is
+    merged down the whole table.
+    """
+    body = []
+    count = 0
+    while count < size:
+        rows = []
+        for row in range(num_rows):
+            cells = []
+            column = 0
+            while column < num_columns:
+                grid_span = None
+                v_merge = None
+                if column == 0 and row % 2:
+                    grid_span = 2
+                if column == 2:
+                    v_merge = 'continue' if row else 'restart'
+                cells.append(DXB.tc(
+                    DXB.p_tag('cell %d' % count),
+                    grid_span=grid_span,
+                    v_merge=v_merge,
+                ))
+                column += grid_span or 1
+                count += 1
+            rows.append(DXB.tr(cells))
+        body.append(DXB.table_from_rows(rows))
+        body.append(DXB.p_tag(SENTENCE % count))
+    return _document(body, count + len(body) // 2)
+
+
+def images(size, num_images=20):
+    """
+    ``size`` paragraphs that each hold an image, there are ``num_images``
+    different images that need to be converted.
+    """
+    body = []
+    media = {}
+    for i in range(size):
+        r_id = 'rIdImage%d' % (i % num_images)
+        media[r_id] = 'image%d.bmp' % (i % num_images)
+        body.append(DXB.drawing(r_id))
+    return _document(body, size, images=media)
+
+
+def hyperlinks(size):
+    """
+    ``size`` paragraphs that each hold a hyperlink between two runs.
+    """
+    body = []
+    links = {}
+    for i in range(size):
+        r_id = 'rIdLink%d' % i
+        links[r_id] = 'http://example.com/%d?a=1&b=2' % i
+        body.append(DXB.p_tag([
+            DXB.r_tag('Before the link'),
+            DXB.hyperlink_tag(r_id, [DXB.r_tag('link %d' % i)]),
+            DXB.r_tag('and after it.'),
+        ]))
+    return _document(body, size, hyperlinks=links)
+
+
+def line_breaks(size, breaks_per_paragraph=10):
+    """
+    Paragraphs with ``size`` line breaks in total, ``breaks_per_paragraph`` in
+    each one.
+    """
+    body = []
+    count = 0
+    while count < size:
+        body.append(DXB.p_tag([
+            DXB.r_tag('line %d' % (count + i), include_linebreak=True)
+            for i in range(breaks_per_paragraph)
+        ]))
+        count += breaks_per_paragraph
+    return _document(body, len(body))
+
+
+GENERATORS = (
+    ('paragraphs', paragraphs),
+    ('nested_lists', nested_lists),
+    ('merged_tables', merged_tables),
+    ('images', images),
+    ('hyperlinks', hyperlinks),
+    ('line_breaks', line_breaks),
+)
+
+
+def _image_data(i):
+    # A bmp, which needs to be converted to a gif, that is not the size it is
+    # shown at, so it needs to be resized as well.
+    image = Image.new('RGB', (320, 80), ((i * 40) % 256, 128, 200))
+    output = BytesIO()
+    image.save(output, 'BMP')
+    return output.getvalue()
+
+
+def write_docx(document, file_path):
+    """
+    Write ``document`` to ``file_path`` as a docx.
+    """
+    relationships = [
+        RELATIONSHIP % (r_id, HYPERLINK_TYPE, target, ' TargetMode="External"')
+        for r_id, target in sorted(document.hyperlinks.items())
+    ]
+    relationships.extend(
+        RELATIONSHIP % (r_id, IMAGE_TYPE, 'media/%s' % name, '')
+        for r_id, name in sorted(document.images.items())
+    )
+    with closing(ZipFile(file_path, 'w', ZIP_DEFLATED)) as zf:
+        zf.writestr('word/document.xml', document.xml.encode('utf-8'))
+        zf.writestr('word/numbering.xml', NUMBERING_XML)
+        zf.writestr(
+            'word/styles.xml',
+            DXB.styles_xml([DXB.style('style0', 'Normal')]),
+        )
+        zf.writestr(
+            'word/_rels/document.xml.rels',
+            RELATIONSHIPS_XML % ''.join(
+                '\n  ' + relationship.replace('&', '&amp;')
+                for relationship in relationships
+            ),
+        )
+        for i, name in enumerate(sorted(set(document.images.values()))):
+            zf.writestr('word/media/%s' % name, _image_data(i))
@@ -0,0 +1,75 @@
+"""
+How ``create_html`` scales with the size of a document.
+"""
+import time
+
+from lxml import etree
+
+from docx2html.benchmarks import get_meta_data
+from docx2html.core import create_html
+from docx2html.tests.document_builder import DocxBuilder as DXB
+
+PARAGRAPH_COUNTS = (500, 1000, 2000, 4000)
+
+
+def paragraphs_xml(num_paragraphs):
+    """
+    A document made up of ``num_paragraphs`` paragraphs, every tenth block of
+    which is a short list. Consecutive lists alternate their numId so that each
+    one ends where the next block of paragraphs starts.
+    """
+    body = []
+    for i in range(num_paragraphs):
+        if i % 10 >= 7:
+            numId = (i // 10) % 2 + 1
+            body.append(DXB.li(text='item %d' % i, ilvl=0, numId=numId))
+        else:
+            body.append(DXB.p_tag(
+                'Paragraph number %d has more than eight words in it.' % i,
+            ))
+    return DXB.xml(''.join(body))
+
+
+def time_create_html(xml, repeat=3):
+    """
+    Return the best wall time (in seconds) of ``repeat`` runs of
+    ``create_html`` on ``xml``.
+    """
+    meta_data = get_meta_data()
+    best = None
+    for _ in range(repeat):
+        # create_html strips tags from the tree, so parse a fresh one for every
+        # run.
+        tree = etree.fromstring(xml)
+        start = time.time()
+        create_html(tree, meta_data)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_paragraph_scaling(counts=PARAGRAPH_COUNTS):
+    """
+    Time ``create_html`` for each paragraph count in ``counts``. Returns a list
+    of ``(num_paragraphs, seconds)`` tuples. If conversion is linear the time
+    per paragraph stays roughly constant across the counts.
+    """
+    results = []
+    for count in counts:
+        results.append((count, time_create_html(paragraphs_xml(count))))
+    return results
+
+
+def main():
+    print '%12s %12s %16s' % ('paragraphs', 'seconds', 'usec/paragraph')
+    for count, seconds in bench_paragraph_scaling():
+        print '%12d %12.4f %16.1f' % (
+            count,
+            seconds,
+            seconds / count * 1000000,
+        )
+
+
+if __name__ == '__main__':
+    main()
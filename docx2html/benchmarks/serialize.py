@@ -0,0 +1,66 @@
+"""
+Cost of closing the void elements (br and img) of the html, compared with
+substituting each of them across the whole html one at a time, which is what
+``serialize_html`` used to do.
+"""
+import re
+import time
+
+from lxml import etree
+
+from docx2html.benchmarks import get_meta_data
+from docx2html.benchmarks.generators import line_breaks
+from docx2html.core import _make_void_elements_self_close, create_html
+
+LINE_BREAK_COUNTS = (1000, 2000, 4000, 8000)
+
+
+def old_make_void_elements_self_close(html):
+    for tag in ('br', 'img'):
+        regex = re.compile(r'<%s.*?>' % tag)
+        for match in regex.findall(html):
+            new_tag = '<%s />' % match.strip('<>')
+            html = re.sub(match, new_tag, html)
+    return html
+
+
+def get_html(num_line_breaks):
+    """
+    The html ``etree.tostring`` writes for a document with
+    ``num_line_breaks`` line breaks, before the void elements are closed.
+    """
+    document = line_breaks(num_line_breaks)
+    tree = etree.fromstring(document.xml.encode('utf-8'))
+    html_el = etree.fromstring(create_html(tree, get_meta_data()))
+    return etree.tostring(html_el, method='html', with_tail=True)
+
+
+def best_time(f, html, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        f(html)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    print '%12s %12s %12s %12s' % ('line breaks', 'html bytes', 'old', 'new')
+    for count in LINE_BREAK_COUNTS:
+        html = get_html(count)
+        assert (
+            old_make_void_elements_self_close(html) ==
+            _make_void_elements_self_close(html)
+        )
+        print '%12d %12d %11.4fs %11.4fs' % (
+            count,
+            len(html),
+            best_time(old_make_void_elements_self_close, html),
+            best_time(_make_void_elements_self_close, html),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Throughput and peak memory of ``create_html``, ``convert`` and ``convert_iter``
+on the synthetic documents in ``docx2html.benchmarks.generators``, across
+document sizes::
+
+    $ python -m docx2html.benchmarks.throughput --output before.json
+    $ git checkout some-branch
+    $ python -m docx2html.benchmarks.throughput --compare before.json
+
+The results are saved as json so they can be compared between commits.
+"""
+import json
+import multiprocessing
+import optparse
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from zipfile import ZipFile
+
+from lxml import etree
+
+from docx2html.benchmarks.generators import GENERATORS, write_docx
+from docx2html.core import (
+    _get_document_data,
+    convert,
+    convert_iter,
+    create_html,
+)
+
+SIZES = (500, 2000, 8000)
+
+
+def time_create_html(file_path, repeat):
+    """
+    The best wall time of ``repeat`` runs of ``create_html`` on the docx at
+    ``file_path``, not counting reading the docx.
+    """
+    best = None
+    for _ in range(repeat):
+        zf = ZipFile(file_path)
+        try:
+            tree, meta_data = _get_document_data(zf)
+            start = time.time()
+            create_html(tree, meta_data)
+            elapsed = time.time() - start
+        finally:
+            zf.close()
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def time_convert(file_path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        convert(file_path)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def time_convert_iter(file_path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for _ in convert_iter(file_path):
+            pass
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _measure_memory(file_path, results):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    convert(file_path)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((after, after - before))
+
+
+def measure_memory(file_path):
+    """
+    Returns the peak memory (in kilobytes) of a process converting the docx at
+    ``file_path``, and how much of it the conversion added. Each conversion
+    is done in a new process so that the peaks do not hide each other.
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_measure_memory,
+        args=(file_path, results),
+    )
+    process.start()
+    peak, growth = results.get()
+    process.join()
+    return peak, growth
+
+
+def bench_generator(name, generator, size, repeat=3):
+    directory = tempfile.mkdtemp()
+    try:
+        document = generator(size)
+        file_path = os.path.join(directory, '%s.docx' % name)
+        write_docx(document, file_path)
+        document_bytes = len(document.xml.encode('utf-8'))
+        create_html_seconds = time_create_html(file_path, repeat)
+        convert_seconds = time_convert(file_path, repeat)
+        convert_iter_seconds = time_convert_iter(file_path, repeat)
+        peak_rss_kb, rss_growth_kb = measure_memory(file_path)
+    finally:
+        shutil.rmtree(directory)
+    return {
+        'generator': name,
+        'size': size,
+        'num_paragraphs': document.num_paragraphs,
+        'document_bytes': document_bytes,
+        'create_html_seconds': create_html_seconds,
+        'convert_seconds': convert_seconds,
+        'convert_iter_seconds': convert_iter_seconds,
+        'paragraphs_per_second': document.num_paragraphs / convert_seconds,
+        'mb_per_second': document_bytes / convert_seconds / 1000000,
+        'peak_rss_kb': peak_rss_kb,
+        'rss_growth_kb': rss_growth_kb,
+    }
+
+
+def _get_commit():
+    try:
+        process = subprocess.Popen(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE,
+            stderr=open(os.devnull, 'w'),
+        )
+    except OSError:
+        return None
+    output, _ = process.communicate()
+    if process.returncode != 0:
+        return None
+    return output.strip()
+
+
+def run(generators=GENERATORS, sizes=SIZES, repeat=3):
+    results = []
+    for name, generator in generators:
+        for size in sizes:
+            results.append(bench_generator(name, generator, size, repeat))
+    return {
+        'commit': _get_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'lxml': etree.__version__,
+        'results': results,
+    }
+
+
+def print_results(report, compare_to=None):
+    old_results = {}
+    if compare_to is not None:
+        for result in compare_to['results']:
+            old_results[(result['generator'], result['size'])] = result
+    print '%14s %6s %10s %10s %12s %12s %8s %10s %8s' % (
+        'generator',
+        'size',
+        'create_html',
+        'convert',
+        'convert_iter',
+        'paragraphs/s',
+        'MB/s',
+        'added KB',
+        'vs old',
+    )
+    for result in report['results']:
+        old = old_results.get((result['generator'], result['size']))
+        change = ''
+        if old is not None:
+            change = '%.2fx' % (
+                old['convert_seconds'] / result['convert_seconds']
+            )
+        print '%14s %6d %10.3fs %9.3fs %11.3fs %12.0f %8.2f %10d %8s' % (
+            result['generator'],
+            result['size'],
+            result['create_html_seconds'],
+            result['convert_seconds'],
+            result['convert_iter_seconds'],
+            result['paragraphs_per_second'],
+            result['mb_per_second'],
+            result['rss_growth_kb'],
+            change,
+        )
+
+
+def main(argv=None):
+    # optparse instead of argparse, which is only in Python 2.7 and later.
+    parser = optparse.OptionParser(description=__doc__.split('\n\n')[0])
+    parser.add_option(
+        '--sizes',
+        default=','.join(str(size) for size in SIZES),
+        help='comma separated document sizes',
+    )
+    parser.add_option(
+        '--generators',
+        default=','.join(name for name, _ in GENERATORS),
+        help='comma separated generator names',
+    )
+    parser.add_option('--repeat', type='int', default=3)
+    parser.add_option('--output', help='save the results to this json file')
+    parser.add_option('--compare', help='json results to compare against')
+    args, _ = parser.parse_args(argv)
+
+    names = args.generators.split(',')
+    report = run(
+        generators=[(n, g) for n, g in GENERATORS if n in names],
+        sizes=[int(size) for size in args.sizes.split(',')],
+        repeat=args.repeat,
+    )
+    compare_to = None
+    if args.compare:
+        with open(args.compare) as f:
+            compare_to = json.load(f)
+    print_results(report, compare_to)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
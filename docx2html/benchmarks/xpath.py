@@ -0,0 +1,81 @@
+"""
+Per-call cost of the precompiled ``XPATH`` registry compared with compiling
+the same expression on every call, which is what the helpers used to do.
+"""
+import timeit
+
+from lxml import etree
+
+from docx2html.core import XPATH
+from docx2html.tests.document_builder import DocxBuilder as DXB
+
+# The registry name, the expression it was compiled from and the tag of the
+# element the helpers evaluate it against.
+EXPRESSIONS = (
+    ('numPr_ilvl', './/w:numPr/w:ilvl', 'p'),
+    ('ilvl', './/w:ilvl', 'p'),
+    ('numId', './/w:numId', 'p'),
+    ('pStyle', './/w:pStyle', 'p'),
+    ('r', './/w:r', 'p'),
+    ('vMerge', './/w:vMerge', 'tc'),
+    ('gridSpan', './/w:gridSpan', 'tc'),
+)
+
+
+def get_elements():
+    """
+    Return a dict of an example element for each tag the expressions are
+    evaluated against.
+    """
+    table = DXB.table(num_rows=2, num_columns=2, text=iter(
+        [DXB.p_tag('AAA')] * 4,
+    ))
+    li = DXB.li(text='AAA', ilvl=0, numId=1)
+    tree = etree.fromstring(DXB.xml(li + table))
+    result = {}
+    for tag in ('p', 'tr', 'tc'):
+        result[tag] = tree.xpath('.//w:%s' % tag, namespaces=tree.nsmap)[0]
+    return result
+
+
+def bench_xpath(number=20000):
+    """
+    Returns a list of ``(name, old_usec, new_usec)`` tuples, the per-call cost
+    of evaluating each expression the old and the new way.
+    """
+    elements = get_elements()
+    results = []
+    for name, expression, tag in EXPRESSIONS:
+        el = elements[tag]
+        compiled = XPATH[name]
+        old = min(timeit.repeat(
+            lambda: el.xpath(expression, namespaces=el.nsmap),
+            number=number,
+            repeat=3,
+        ))
+        new = min(timeit.repeat(
+            lambda: compiled(el),
+            number=number,
+            repeat=3,
+        ))
+        results.append((
+            name,
+            old / number * 1000000,
+            new / number * 1000000,
+        ))
+    return results
+
+
+def main():
+    print '%12s %12s %12s %8s' % (
+        'expression',
+        'old usec',
+        'new usec',
+        'ratio',
+    )
+    for name, old, new in bench_xpath():
+        print '%12s %12.2f %12.2f %8.1f' % (name, old, new, old / new)
+
+
+if __name__ == '__main__':
+    main()
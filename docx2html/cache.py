@@ -0,0 +1,209 @@
+"""
+Caches for the work done while converting a docx.
+
+A cache has ``get(key)`` (which returns None if ``key`` is not cached) and
+``set(key, value)``, the keys are strings. Every cache counts its ``hits``
+and ``misses``, ``stats`` returns them.
+"""
+import cPickle
+import hashlib
+import os
+import os.path
+import sys
+import tempfile
+import threading
+
+
+def get_digest(data):
+    """
+    Returns the hash used to key things by their contents.
+    """
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_callable_key(f):
+    """
+    Returns a key for the function ``f`` (which can be None). A function that
+    can be imported is keyed by where it is imported from, so the key is the
+    same in every process. Any other callable (an instance of a class with a
+    ``__call__`` for example) can give its own key as its ``cache_key``.
+    Anything else (a lambda, a closure, a bound method) has no key and None
+    is returned: its identity could be reused by another function once it
+    has been garbage collected.
+
+    >>> get_callable_key(get_digest)
+    'docx2html.cache.get_digest'
+    >>> get_callable_key(None)
+    'None'
+    >>> get_callable_key(lambda: None) is None
+    True
+    """
+    if f is None:
+        return 'None'
+    cache_key = getattr(f, 'cache_key', None)
+    if cache_key is not None:
+        return cache_key
+    module_name = getattr(f, '__module__', None)
+    name = getattr(f, '__name__', None)
+    module = sys.modules.get(module_name)
+    if name is not None and getattr(module, name, None) is f:
+        return '%s.%s' % (module_name, name)
+    return None
+
+
+class _Cache(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # The lock can not be pickled, every process gets its own.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class MemoryCache(_Cache):
+    """
+    Holds up to ``max_entries`` values in memory, once it is full the least
+    recently used value is thrown away.
+    """
+
+    def __init__(self, max_entries=1024):
+        super(MemoryCache, self).__init__()
+        self.max_entries = max_entries
+        self._values = {}
+        # When each key was last used, counted in calls to ``_use``.
+        self._last_used = {}
+        self._clock = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def _use(self, key):
+        self._clock += 1
+        self._last_used[key] = self._clock
+
+    def _get(self, key):
+        if key not in self._values:
+            return None
+        # The key is now the most recently used.
+        self._use(key)
+        return self._values[key]
+
+    def _set(self, key, value):
+        self._values[key] = value
+        self._use(key)
+        while len(self._values) > self.max_entries:
+            key = min(self._last_used, key=self._last_used.get)
+            del self._values[key]
+            del self._last_used[key]
+
+
+class DirectoryCache(_Cache):
+    """
+    Pickles the values to files in ``directory``, so they are shared between
+    processes and survive restarts. Once the files take up more than
+    ``max_size`` bytes the least recently used ones are removed.
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        super(DirectoryCache, self).__init__()
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._size = None
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, get_digest(key))
+
+    def _get(self, key):
+        path = self._get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = cPickle.load(f)
+        except (IOError, OSError, EOFError, cPickle.UnpicklingError):
+            return None
+        # Keep track of when it was last used for the eviction.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def _set(self, key, value):
+        path = self._get_path(key)
+        # Write to a temp file first so that no other process can read a half
+        # written value.
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            cPickle.dump(value, f, cPickle.HIGHEST_PROTOCOL)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._get_files())
+        self._size -= self._get_file_size(path)
+        os.rename(temp_path, path)
+        self._size += self._get_file_size(path)
+        if self._size > self.max_size:
+            self._evict()
+
+    def _get_file_size(self, path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _get_files(self):
+        """
+        Returns a list of the path, size and last time used of every value.
+        """
+        result = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another process.
+                continue
+            result.append((path, stat.st_size, stat.st_mtime))
+        return result
+
+    def _evict(self):
+        # Other processes might be using the directory as well, so start from
+        # what is actually there.
+        files = sorted(self._get_files(), key=lambda f: f[2])
+        self._size = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
@@ -1,4 +1,11 @@
+import logging
+import os
+import Queue
 import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 
 def convert_with_abiword(docx_path, file_path):
@@ -15,3 +22,186 @@ def convert_with_abiword(docx_path, file_path):
             file_path,
         ],
     )
+
+
+class _ShellProcess(object):
+    """
+    A converter process that reads commands from stdin and prints ``prompt``
+    once it is ready for the next one.
+    """
+
+    def __init__(self, args, prompt):
+        self.prompt = prompt
+        self.jobs = 0
+        self.process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            close_fds=True,
+        )
+        # Read the output in a thread so that waiting for the prompt can time
+        # out.
+        self._output = Queue.Queue()
+        reader = threading.Thread(target=self._read_output)
+        reader.daemon = True
+        reader.start()
+
+    def _read_output(self):
+        fd = self.process.stdout.fileno()
+        while True:
+            data = os.read(fd, 4096)
+            self._output.put(data)
+            if not data:
+                # The process exited.
+                return
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def wait_for_prompt(self, timeout):
+        """
+        Returns True if the prompt was printed within ``timeout`` seconds.
+        """
+        deadline = time.time() + timeout
+        output = ''
+        while not output.endswith(self.prompt):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            try:
+                data = self._output.get(timeout=remaining)
+            except Queue.Empty:
+                return False
+            if not data:
+                return False
+            output += data
+        return True
+
+    def run(self, command, timeout):
+        """
+        Send ``command`` and return True if it finished within ``timeout``
+        seconds.
+        """
+        try:
+            self.process.stdin.write(command + '\n')
+            self.process.stdin.flush()
+        except IOError:
+            # The process exited.
+            return False
+        self.jobs += 1
+        return self.wait_for_prompt(timeout)
+
+    def kill(self):
+        if self.is_alive():
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+        self.process.wait()
+
+
+class ConverterPool(object):
+    """
+    A drop in replacement for ``convert_with_abiword`` that keeps up to
+    ``workers`` abiword processes running (in its AbiCommand shell mode) and
+    hands each conversion to one that is not busy, instead of starting abiword
+    for every file::
+
+        converter = ConverterPool(workers=4)
+        html = convert('path/to/doc/file', converter=converter)
+
+    ``timeout`` is how many seconds a conversion (or starting a process) can
+        take before the process is killed.
+    ``max_jobs`` is how many conversions a process does before it is replaced
+        with a new one.
+
+    Processes are started the first time they are needed and replaced when
+    they crash. A conversion that fails or times out is logged and the docx
+    is not created, the same as when ``convert_with_abiword`` fails, so
+    ``convert`` raises ``ConversionFailed`` (or uses its ``fall_back``).
+
+    ``args`` and ``prompt`` are the command line of the shell and the prompt
+    it prints when it is ready for a command, ``get_command`` builds the
+    command for a conversion. Override them to use another converter.
+
+    ``cache_key`` keys the html ``convert`` builds with the pool (see
+    ``docx2html.cache``), pools that run the same command line share it.
+    """
+    args = ['abiword', '--plugin=AbiCommand']
+    prompt = 'AbiWord:> '
+
+    def __init__(
+            self,
+            workers=2,
+            timeout=60,
+            max_jobs=100,
+            args=None,
+            prompt=None):
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        if args is not None:
+            self.args = args
+        if prompt is not None:
+            self.prompt = prompt
+        # None is a process that has not been started yet.
+        self._idle = Queue.Queue()
+        for _ in range(workers):
+            self._idle.put(None)
+        self._workers = workers
+
+    @property
+    def cache_key(self):
+        return '%s.%s:%s' % (
+            type(self).__module__,
+            type(self).__name__,
+            ' '.join(self.args),
+        )
+
+    def get_command(self, docx_path, file_path):
+        return 'convert "%s" "%s" docx' % (file_path, docx_path)
+
+    def _start_process(self):
+        try:
+            process = _ShellProcess(self.args, self.prompt)
+        except OSError:
+            logger.exception('Could not start %s', self.args[0])
+            return None
+        if not process.wait_for_prompt(self.timeout):
+            logger.error('%s did not start', self.args[0])
+            process.kill()
+            return None
+        return process
+
+    def __call__(self, docx_path, file_path):
+        process = self._idle.get()
+        try:
+            if process is not None and not process.is_alive():
+                logger.warning('%s exited, restarting it', self.args[0])
+                process.kill()
+                process = None
+            if process is None:
+                process = self._start_process()
+                if process is None:
+                    return
+            command = self.get_command(docx_path, file_path)
+            if not process.run(command, self.timeout):
+                logger.error('Converting %s failed or timed out', file_path)
+                process.kill()
+                process = None
+            elif process.jobs >= self.max_jobs:
+                process.kill()
+                process = None
+        finally:
+            self._idle.put(process)
+
+    def close(self):
+        """
+        Stop all of the processes, this waits for the busy ones to finish.
+        """
+        for _ in range(self._workers):
+            process = self._idle.get()
+            if process is not None:
+                process.kill()
+        for _ in range(self._workers):
+            self._idle.put(None)
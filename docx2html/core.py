@@ -1,15 +1,21 @@
-import cgi
 import logging
 import os
 import os.path
 import re
+import shutil
+import tempfile
+import time
+from contextlib import closing
+from functools import wraps
+from io import BytesIO
 from PIL import Image
 from lxml import etree
 from lxml.etree import XMLSyntaxError
 
-from collections import namedtuple, defaultdict
+from collections import namedtuple, defaultdict, deque
 from zipfile import ZipFile, BadZipfile
 
+from docx2html.cache import get_callable_key, get_digest
 from docx2html.exceptions import (
     ConversionFailed,
     FileNotDocx,
@@ -17,15 +23,69 @@ from docx2html.exceptions import (
     UnintendedTag,
     SyntaxNotSupported,
 )
+from docx2html.metrics import get_media_sizes, get_tree_metrics
+from docx2html.timing import time_stage
 
 DETECT_FONT_SIZE = False
 EMUS_PER_PIXEL = 9525
-NSMAP = {}
 IMAGE_EXTENSIONS_TO_SKIP = ['emf', 'wmf', 'svg']
 DEFAULT_LIST_NUMBERING_STYLE = 'decimal'
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+# Strict Open XML documents use a different namespace for the same tags.
+STRICT_W_NAMESPACE = 'http://purl.oclc.org/ooxml/wordprocessingml/main'
+W_NAMESPACES = (W_NAMESPACE, STRICT_W_NAMESPACE)
+# A paragraph with more words than this is not turned into a header because it
+# is bold or italics.
+MAX_HEADER_WORDS = 8
+# The contents of a docx that ``get_zip_file_handler`` can read from memory,
+# memoryview is only in Python 2.7 and later.
+try:
+    BINARY_TYPES = (bytearray, buffer, memoryview)
+except NameError:
+    BINARY_TYPES = (bytearray, buffer)
 
 logger = logging.getLogger(__name__)
 
+
+def _w_xpath(path, w_namespace=W_NAMESPACE):
+    return etree.XPath(path, namespaces={'w': w_namespace})
+
+XPATH_EXPRESSIONS = {
+    'gridSpan': './/w:gridSpan',
+    'ilvl': './/w:ilvl',
+    'numId': './/w:numId',
+    'numPr_ilvl': './/w:numPr/w:ilvl',
+    'p': '//w:p',
+    'pStyle': './/w:pStyle',
+    'r': './/w:r',
+    'vMerge': './/w:vMerge',
+}
+
+# Compiling an XPath expression costs far more than evaluating it, and the
+# helpers below are called for nearly every element in a document, so compile
+# each expression once for each of the w namespaces, keyed by the namespace as
+# ``get_namespace`` returns it.
+XPATHS = dict(
+    ('{%s}' % w_namespace, dict(
+        (name, _w_xpath(path, w_namespace))
+        for name, path in XPATH_EXPRESSIONS.items()
+    ))
+    for w_namespace in W_NAMESPACES
+)
+XPATH = XPATHS['{%s}' % W_NAMESPACE]
+
+
+def get_xpath(name, w_namespace):
+    """
+    Returns the compiled ``XPATH_EXPRESSIONS[name]`` for ``w_namespace`` (from
+    ``get_namespace``). A w namespace that is not in ``W_NAMESPACES`` has the
+    expression compiled every time.
+    """
+    xpaths = XPATHS.get(w_namespace)
+    if xpaths is None:
+        return _w_xpath(XPATH_EXPRESSIONS[name], w_namespace[1:-1])
+    return xpaths[name]
+
 ###
 # Help functions
 ###
@@ -46,37 +106,89 @@ def replace_ext(file_path, new_ext):
     return file_path[:index] + new_ext
 
 
+def normalize_ext(ext):
+    """
+    >>> normalize_ext('.docx')
+    '.docx'
+    >>> normalize_ext('DOCX')
+    '.docx'
+    """
+    if not ext.startswith(os.extsep):
+        ext = os.extsep + ext
+    return ext.lower()
+
+
 def ensure_tag(tags):
     # For some functions we can short-circuit and early exit if the tag is not
     # the right kind.
+    # The qualified names of ``tags`` in each of ``W_NAMESPACES`` are worked
+    # out once, the namespace of the document is only looked up for tags in
+    # some other namespace. The function without the check is the
+    # ``unchecked`` attribute of the wrapper, for callers that already know
+    # the tag is the right kind.
+    tag_names = frozenset(tags)
+    valid_tags = frozenset(
+        '{%s}%s' % (w_namespace, t)
+        for w_namespace in W_NAMESPACES
+        for t in tags
+    )
 
     def wrapped(f):
+        @wraps(f)
         def wrap(*args, **kwargs):
             passed_in_tag = args[0]
             if passed_in_tag is None:
                 return None
+            tag = passed_in_tag.tag
+            if tag in valid_tags:
+                return f(*args, **kwargs)
+            if (
+                    not isinstance(tag, basestring) or
+                    tag.startswith(_W_NAMESPACE_PREFIXES)):
+                # A comment, or a w tag that is not one of ``tags``.
+                return None
             w_namespace = get_namespace(passed_in_tag, 'w')
-            valid_tags = [
-                '%s%s' % (w_namespace, t) for t in tags
-            ]
-            if passed_in_tag.tag in valid_tags:
+            if (
+                    tag.startswith(w_namespace) and
+                    tag[len(w_namespace):] in tag_names):
                 return f(*args, **kwargs)
             return None
+        wrap.unchecked = f
         return wrap
     return wrapped
 
-
-def get_namespace(el, namespace):
-    if namespace not in NSMAP:
-        NSMAP[namespace] = '{%s}' % el.nsmap[namespace]
-    return NSMAP[namespace]
+_W_NAMESPACE_PREFIXES = tuple(
+    '{%s}' % w_namespace for w_namespace in W_NAMESPACES
+)
 
 
-def convert_image(target, image_size):
-    _, extension = os.path.splitext(os.path.basename(target))
-    # If the image size has a zero in it early return
-    if image_size and not all(image_size):
-        return target
+def get_namespace(el, namespace):
+    """
+    Returns the uri (in braces, ready to put in front of a tag name) that
+    ``namespace`` (a prefix like ``'w'``) stands for where ``el`` is. Nothing
+    is cached between documents, so documents that use different uris for the
+    same prefix (Strict Open XML for example) can be converted at the same
+    time.
+    """
+    if el.prefix == namespace:
+        # The uri is already in the tag, which is quicker than the nsmap.
+        tag = el.tag
+        return tag[:tag.index('}') + 1]
+    nsmap = el.nsmap
+    if namespace not in nsmap:
+        # Comments do not have an nsmap of their own.
+        parent = el.getparent()
+        if parent is not None:
+            return get_namespace(parent, namespace)
+    return '{%s}' % nsmap[namespace]
+
+
+def _convert_image(image_file, extension, image_size):
+    """
+    Open the image in ``image_file`` and resize it to ``image_size``. Returns
+    the image along with the format and the extension it needs to be saved
+    with, or None if the image can not be opened.
+    """
     # All the image types need to be converted to gif.
     invalid_extensions = (
         '.bmp',
@@ -86,11 +198,10 @@ def convert_image(target, image_size):
     )
     # Open the image and get the format.
     try:
-        image = Image.open(target)
+        image = Image.open(image_file)
     except IOError:
-        return target
+        return None
     image_format = image.format
-    image_file_name = target
 
     # Make sure the size of the image and the size of the embedded image are
     # the same.
@@ -103,8 +214,22 @@ def convert_image(target, image_size):
 
     # If we have an invalid extension, change the format to gif.
     if extension.lower() in invalid_extensions:
-        image_format = 'GIF'
-        image_file_name = replace_ext(target, '.gif')
+        return image, 'GIF', '.gif'
+    return image, image_format, extension
+
+
+def convert_image(target, image_size):
+    _, extension = os.path.splitext(os.path.basename(target))
+    # If the image size has a zero in it early return
+    if image_size and not all(image_size):
+        return target
+    converted = _convert_image(target, extension, image_size)
+    if converted is None:
+        return target
+    image, image_format, new_extension = converted
+    image_file_name = target
+    if new_extension != extension:
+        image_file_name = replace_ext(target, new_extension)
 
     # Resave the image (Post resizing) with the correct format
     try:
@@ -114,6 +239,30 @@ def convert_image(target, image_size):
     return image_file_name
 
 
+def convert_image_data(name, data, image_size):
+    """
+    The same as ``convert_image`` only the image is converted in memory.
+    ``name`` is the name of the image and ``data`` is its contents. Returns the
+    name and the contents of the converted image.
+    """
+    _, extension = os.path.splitext(os.path.basename(name))
+    # If the image size has a zero in it early return
+    if image_size and not all(image_size):
+        return name, data
+    converted = _convert_image(BytesIO(data), extension, image_size)
+    if converted is None:
+        return name, data
+    image, image_format, new_extension = converted
+    output = BytesIO()
+    try:
+        image.save(output, image_format)
+    except IOError:
+        return name, data
+    if new_extension != extension:
+        name = replace_ext(name, new_extension)
+    return name, output.getvalue()
+
+
 @ensure_tag(['p'])
 def get_font_size(p, styles_dict):
     w_namespace = get_namespace(p, 'w')
@@ -182,63 +331,28 @@ def is_natural_header(el, styles_dict):
 
 @ensure_tag(['p'])
 def is_header(el, meta_data):
-    if _is_top_level_upper_roman(el, meta_data):
-        return 'h2'
-    el_is_natural_header = is_natural_header(el, meta_data.styles_dict)
-    if el_is_natural_header:
-        return el_is_natural_header
-    if _is_li(el):
-        return False
-    w_namespace = get_namespace(el, 'w')
-    if el.tag == '%stbl' % w_namespace:
-        return False
-
-    # Check to see if this is a header because the font size is different than
-    # the normal font size.
-    # Since get_font_size is a method used before meta is created, just pass in
-    # styles_dict.
-    if DETECT_FONT_SIZE:
-        font_size = get_font_size(el, meta_data.styles_dict)
-        if font_size is not None:
-            if meta_data.font_sizes_dict[font_size]:
-                return meta_data.font_sizes_dict[font_size]
-
-    # If a paragraph is longer than eight words it is likely not supposed to be
-    # an h tag.
-    num_words = len(
-        etree.tostring(
-            el,
-            encoding=unicode,
-            method='text',
-        ).split(' ')
-    )
-    if num_words > 8:
-        return False
-
-    # Check to see if the full line is bold.
-    whole_line_bold, whole_line_italics = whole_line_styled(el)
-    if whole_line_bold or whole_line_italics:
-        return 'h2'
+    return get_paragraph_info(el, meta_data).header
 
-    return False
 
-
-@ensure_tag(['p'])
-def _is_top_level_upper_roman(el, meta_data):
-    w_namespace = get_namespace(el, 'w')
-    ilvl = get_ilvl(el, w_namespace)
+def _is_upper_roman_level(meta_data, numId, ilvl):
     # If this list is not in the root document (indentation of 0), then it
     # cannot be a top level upper roman list.
     if ilvl != 0:
         return False
-    numId = get_numId(el, w_namespace)
     list_type = meta_data.numbering_dict[numId].get(ilvl, False)
     return list_type == 'upperRoman'
 
 
+@ensure_tag(['p'])
+def _is_top_level_upper_roman(el, meta_data):
+    info = get_paragraph_info(el, meta_data)
+    return _is_upper_roman_level(meta_data, info.numId, info.ilvl)
+
+
 @ensure_tag(['p'])
 def _is_li(el):
-    return len(el.xpath('.//w:numPr/w:ilvl', namespaces=el.nsmap)) != 0
+    numPr_ilvls = get_xpath('numPr_ilvl', get_namespace(el, 'w'))(el)
+    return len(numPr_ilvls) != 0
 
 
 @ensure_tag(['p'])
@@ -249,18 +363,48 @@ def is_li(el, meta_data):
     (indentation level)
     """
 
-    if is_header(el, meta_data):
-        return False
-    return _is_li(el)
+    return get_paragraph_info(el, meta_data).is_li
 
 
-def has_text(p):
+def has_text(p, meta_data=None):
     """
     It is possible for a ``p`` tag in document.xml to not have any content. If
     this is the case we do not want that tag interfering with things like
     lists. Detect if this tag has any content.
     """
-    return '' != etree.tostring(p, encoding=unicode, method='text').strip()
+    if meta_data is not None and _is_p(p):
+        return get_paragraph_info(p, meta_data).has_text
+    _, p_has_text = get_text_info(p, max_words=0)
+    return p_has_text
+
+
+def get_text_info(el, max_words=None):
+    """
+    Returns a tuple of the number of space separated words in the text of
+    ``el`` and whether any of that text is not whitespace. The text is all of
+    the text in ``el`` (what ``etree.tostring(el, method='text')`` gives),
+    including the whitespace between tags.
+
+    If ``max_words`` is passed in the text of the t tags is looked at first,
+    one t tag at a time, and as soon as it has more than ``max_words`` words
+    and some text the rest of ``el`` is skipped. The rest of the text can only
+    add to both of those. In that case the number of words is
+    ``max_words + 1``. Only short paragraphs are serialized.
+    """
+    if max_words is not None:
+        num_words = 1
+        el_has_text = False
+        for t in el.iter('%st' % get_namespace(el, 'w')):
+            text = t.text
+            if not text:
+                continue
+            num_words += text.count(' ')
+            if not el_has_text:
+                el_has_text = not text.isspace()
+            if el_has_text and num_words > max_words:
+                return max_words + 1, True
+    text = etree.tostring(el, encoding=unicode, method='text')
+    return text.count(' ') + 1, text.strip() != ''
 
 
 def is_last_li(li, meta_data, current_numId):
@@ -269,68 +413,102 @@ def is_last_li(li, meta_data, current_numId):
     """
     if not is_li(li, meta_data):
         return False
-    w_namespace = get_namespace(li, 'w')
-    next_el = li
-    while True:
-        # If we run out of element this must be the last list item
-        if next_el is None:
-            return True
+    list_index = get_list_index(li.getparent(), meta_data)
+    # If we run out of list items this must be the last list item, otherwise
+    # it is the last one if the next list item belongs to a different list.
+    next_numId = list_index.next_li_numIds[list_index.positions[li]]
+    return next_numId is None or current_numId != next_numId
 
-        next_el = next_el.getnext()
-        # Ignore elements that are not a list item
-        if not is_li(next_el, meta_data):
-            continue
 
-        new_numId = get_numId(next_el, w_namespace)
-        if current_numId != new_numId:
-            return True
-        # If we have gotten here then we have found another list item in the
-        # current list, so ``li`` is not the last li in the list.
-        return False
+def get_list_index(parent, meta_data):
+    """
+    Sweep the children of ``parent`` once (back to front) and record, for each
+    child, the numId of the next list item that follows it. This is what lets
+    list runs be found without scanning ahead from every list item.
+    """
+    list_indexes = meta_data.list_indexes
+    if list_indexes is not None and parent in list_indexes:
+        return list_indexes[parent]
+    children = list(parent)
+    next_li_numIds = [None] * len(children)
+    next_numId = None
+    for i in reversed(range(len(children))):
+        next_li_numIds[i] = next_numId
+        el = children[i]
+        if is_li(el, meta_data):
+            next_numId = get_paragraph_info(el, meta_data).numId
+    list_index = ListIndex(
+        children=children,
+        positions=dict((el, i) for i, el in enumerate(children)),
+        next_li_numIds=next_li_numIds,
+    )
+    if list_indexes is not None:
+        list_indexes[parent] = list_index
+    return list_index
 
 
 @ensure_tag(['p'])
-def get_single_list_nodes_data(li, meta_data):
+def get_list_run(li, meta_data):
     """
-    Find consecutive li tags that have content that have the same list id.
+    Find consecutive li tags that have content that have the same list id,
+    along with any content (p and tbl tags) that belongs to those list items.
+    Returns a ``ListRun`` that can be handed to ``build_list``.
     """
-    yield li
-    w_namespace = get_namespace(li, 'w')
-    current_numId = get_numId(li, w_namespace)
-    starting_ilvl = get_ilvl(li, w_namespace)
-    el = li
-    while True:
-        el = el.getnext()
-        if el is None:
-            break
+    list_index = get_list_index(li.getparent(), meta_data)
+    children = list_index.children
+    next_li_numIds = list_index.next_li_numIds
+    info = get_paragraph_info(li, meta_data)
+    current_numId = info.numId
+    starting_ilvl = info.ilvl
+    nodes = [li]
+    for i in range(list_index.positions[li] + 1, len(children)):
+        el = children[i]
         # If the tag has no content ignore it.
-        if not has_text(el):
+        if not has_text(el, meta_data):
             continue
 
+        # Only p tags can be list items, anything else (tables) is content
+        # that belongs to the current list item.
+        if not _is_p(el):
+            nodes.append(el)
+            continue
+        info = get_paragraph_info(el, meta_data)
+
         # Stop the lists if you come across a list item that should be a
         # heading.
-        if _is_top_level_upper_roman(el, meta_data):
+        if _is_upper_roman_level(meta_data, info.numId, info.ilvl):
             break
 
-        if (
-                is_li(el, meta_data) and
-                (starting_ilvl > get_ilvl(el, w_namespace))):
+        if info.is_li and starting_ilvl > info.ilvl:
             break
 
-        new_numId = get_numId(el, w_namespace)
-        if new_numId is None or new_numId == -1:
-            # Not a p tag or a list item
-            yield el
+        new_numId = info.numId
+        if new_numId == -1:
+            # Not a list item
+            nodes.append(el)
             continue
         # If the list id of the next tag is different that the previous that
         # means a new list being made (not nested)
         if current_numId != new_numId:
             # Not a subsequent list.
             break
-        if is_last_li(el, meta_data, current_numId):
-            yield el
+        nodes.append(el)
+        # Stop after the last list item of this list.
+        if info.is_li and next_li_numIds[i] != current_numId:
             break
-        yield el
+    return ListRun(
+        numId=current_numId,
+        ilvl=starting_ilvl,
+        nodes=nodes,
+    )
+
+
+@ensure_tag(['p'])
+def get_single_list_nodes_data(li, meta_data):
+    """
+    Find consecutive li tags that have content that have the same list id.
+    """
+    return get_list_run(li, meta_data).nodes
 
 
 @ensure_tag(['p'])
@@ -340,7 +518,7 @@ def get_ilvl(li, w_namespace):
     tag is at. This is used to determine if the li tag needs to be nested or
     not.
     """
-    ilvls = li.xpath('.//w:ilvl', namespaces=li.nsmap)
+    ilvls = get_xpath('ilvl', w_namespace)(li)
     if len(ilvls) == 0:
         return -1
     return int(ilvls[0].get('%sval' % w_namespace))
@@ -353,7 +531,7 @@ def get_numId(li, w_namespace):
     to determine what the list should look like (unordered, digits, lower
     alpha, etc)
     """
-    numIds = li.xpath('.//w:numId', namespaces=li.nsmap)
+    numIds = get_xpath('numId', w_namespace)(li)
     if len(numIds) == 0:
         return -1
     return numIds[0].get('%sval' % w_namespace)
@@ -399,7 +577,7 @@ def get_v_merge(tc):
     """
     if tc is None:
         return None
-    v_merges = tc.xpath('.//w:vMerge', namespaces=tc.nsmap)
+    v_merges = get_xpath('vMerge', get_namespace(tc, 'w'))(tc)
     if len(v_merges) != 1:
         return None
     v_merge = v_merges[0]
@@ -414,80 +592,70 @@ def get_grid_span(tc):
     from gridSpan to colspan.
     """
     w_namespace = get_namespace(tc, 'w')
-    grid_spans = tc.xpath('.//w:gridSpan', namespaces=tc.nsmap)
+    grid_spans = get_xpath('gridSpan', w_namespace)(tc)
     if len(grid_spans) != 1:
         return 1
     grid_span = grid_spans[0]
     return int(grid_span.get('%sval' % w_namespace))
 
 
-@ensure_tag(['tr'])
-def get_td_at_index(tr, index):
-    """
-    When calculating the rowspan for a given cell it is required to find all
-    table cells 'below' the initial cell with a v_merge. This function will
-    return the td element at the passed in index, taking into account colspans.
+@ensure_tag(['tbl'])
+def get_table_grid(table):
     """
-    current = 0
-    for td in tr.xpath('.//w:tc', namespaces=tr.nsmap):
-        if index == current:
-            return td
-        current += get_grid_span(td)
+    Work out the rowspan and colspan of every table cell in ``table`` in a
+    single pass over its rows. Returns a dict of ``CellSpan`` keyed by the tc
+    tags of the table (nested tables get their own grid).
 
-
-@ensure_tag(['tbl'])
-def get_rowspan_data(table):
+    The ``rowspan`` of a ``CellSpan`` is None for cells that are not part of a
+    vMerge, 0 for cells that continue the rowspan of a cell above them (and so
+    are left out of the html) and the full rowspan for the cell that starts it.
+    """
     w_namespace = get_namespace(table, 'w')
-
-    # We need to keep track of what table row we are on as well as which table
-    # cell we are on.
-    tr_index = 0
-    td_index = 0
-
-    # Get a list of all the table rows.
-    tr_rows = list(table.xpath('.//w:tr', namespaces=table.nsmap))
-
-    # Loop through each table row.
-    for tr in table.xpath('.//w:tr', namespaces=table.nsmap):
-        # Loop through each table cell.
-        for td in tr.xpath('.//w:tc', namespaces=tr.nsmap):
-            # Check to see if this cell has a v_merge
-            v_merge = get_v_merge(td)
-
-            # If not increment the td_index and move on
+    colspans = {}
+    rowspans = {}
+
+    # The cells whose rowspan is still open, keyed by the grid column they
+    # start at.
+    open_rowspans = {}
+    for tr in table.iterchildren('%str' % w_namespace):
+        # Figure out which grid column each table cell starts at.
+        column = 0
+        row_cells = {}
+        for tc in tr.iterchildren('%stc' % w_namespace):
+            colspan = get_grid_span(tc)
+            v_merge = get_v_merge(tc)
             if v_merge is None:
-                td_index += get_grid_span(td)
+                state = None
+            elif v_merge.get('%sval' % w_namespace) == 'restart':
+                state = 'restart'
+            else:
+                state = 'continue'
+            row_cells[column] = (tc, colspan, state)
+            column += colspan
+
+        # A rowspan continues for as long as the cell in the same grid column
+        # of the next row has a vMerge that is not a restart.
+        for column in list(open_rowspans):
+            _, _, state = row_cells.get(column, (None, None, None))
+            if state != 'continue':
+                del open_rowspans[column]
                 continue
+            rowspans[open_rowspans[column]] += 1
+
+        for column, (tc, colspan, state) in row_cells.items():
+            colspans[tc] = colspan
+            if state is None:
+                rowspans[tc] = None
+            elif state == 'restart':
+                rowspans[tc] = 1
+                open_rowspans[column] = tc
+            else:
+                rowspans[tc] = 0
 
-            # If it does have a v_merge we need to see if it is the ``root``
-            # table cell (the first in a row to have a rowspan)
-            # If the value is restart then this is the table cell that needs
-            # the rowspan.
-            if v_merge.get('%sval' % w_namespace) == 'restart':
-                row_span = 1
-                # Loop through each table row after the current one.
-                for tr_el in tr_rows[tr_index + 1:]:
-                    # Get the table cell at the current td_index.
-                    td_el = get_td_at_index(tr_el, td_index)
-                    td_el_v_merge = get_v_merge(td_el)
-
-                    # If the td_ell does not have a v_merge then the rowspan is
-                    # done.
-                    if td_el_v_merge is None:
-                        break
-                    val = td_el_v_merge.get('%sval' % w_namespace)
-                    # If the v_merge is restart then there is another cell that
-                    # needs a rowspan, so the current cells rowspan is done.
-                    if val == 'restart':
-                        break
-                    # Increment the row_span
-                    row_span += 1
-                yield row_span
-            # Increment the indexes.
-            td_index += get_grid_span(td)
-        tr_index += 1
-        # Reset the td_index when we finish each table row.
-        td_index = 0
+    return dict(
+        (tc, CellSpan(rowspan=rowspans[tc], colspan=colspan))
+        for tc, colspan in colspans.items()
+    )
 
 
 @ensure_tag(['b', 'i', 'u'])
@@ -513,7 +681,7 @@ def is_bold(r):
     if rpr is None:
         return False
     bold = rpr.find('%sb' % w_namespace)
-    return style_is_false(bold)
+    return style_is_false.unchecked(bold)
 
 
 @ensure_tag(['r'])
@@ -527,7 +695,7 @@ def is_italics(r):
     if rpr is None:
         return False
     italics = rpr.find('%si' % w_namespace)
-    return style_is_false(italics)
+    return style_is_false.unchecked(italics)
 
 
 @ensure_tag(['r'])
@@ -541,7 +709,7 @@ def is_underlined(r):
     if rpr is None:
         return False
     underline = rpr.find('%su' % w_namespace)
-    return style_is_false(underline)
+    return style_is_false.unchecked(underline)
 
 
 @ensure_tag(['p'])
@@ -551,7 +719,7 @@ def is_title(p):
     True if the passed in p tag is considered a title.
     """
     w_namespace = get_namespace(p, 'w')
-    styles = p.xpath('.//w:pStyle', namespaces=p.nsmap)
+    styles = get_xpath('pStyle', w_namespace)(p)
     if len(styles) == 0:
         return False
     style = styles[0]
@@ -595,6 +763,10 @@ def get_image_id(drawing):
                 return image_id
 
 
+def _is_p(el):
+    return el.tag == '%sp' % get_namespace(el, 'w')
+
+
 @ensure_tag(['p'])
 def whole_line_styled(p):
     """
@@ -603,12 +775,12 @@ def whole_line_styled(p):
     line is bold, False otherwise. The second boolean will be True if the whole
     line is italics, False otherwise.
     """
-    r_tags = p.xpath('.//w:r', namespaces=p.nsmap)
+    r_tags = get_xpath('r', get_namespace(p, 'w'))(p)
     tags_are_bold = [
-        is_bold(r) or is_underlined(r) for r in r_tags
+        is_bold.unchecked(r) or is_underlined.unchecked(r) for r in r_tags
     ]
     tags_are_italics = [
-        is_italics(r) for r in r_tags
+        is_italics.unchecked(r) for r in r_tags
     ]
     return all(tags_are_bold), all(tags_are_italics)
 
@@ -622,10 +794,153 @@ MetaData = namedtuple(
         'font_sizes_dict',
         'image_handler',
         'image_sizes',
+        # Filled in by ``classify_paragraphs``, a dict of ``ParagraphInfo``
+        # keyed by p tag.
+        'paragraph_info',
+        # A dict of ``ListIndex`` keyed by parent element, filled in as lists
+        # are built.
+        'list_indexes',
+        # A list of img elements and the results of the image handler that
+        # are not ready yet, see ``build_image``.
+        'deferred_srcs',
+        # See ``docx2html.timing``.
+        'timing_hook',
+    ],
+)
+MetaData.__new__.__defaults__ = (None, None, None, None)
+
+ListIndex = namedtuple(
+    'ListIndex',
+    [
+        'children',
+        'positions',
+        'next_li_numIds',
+    ],
+)
+
+CellSpan = namedtuple(
+    'CellSpan',
+    [
+        'rowspan',
+        'colspan',
+    ],
+)
+
+ListRun = namedtuple(
+    'ListRun',
+    [
+        'numId',
+        'ilvl',
+        'nodes',
+    ],
+)
+
+# Everything the HTML builders need to know about a single p tag. ``header`` is
+# the h tag the paragraph should become (or False), ``num_words`` is the number
+# of space separated words, counted up to one more than ``MAX_HEADER_WORDS``,
+# and ``whole_line_bold``/``whole_line_italics`` are only worked out (otherwise
+# None) when they can affect the output, which is for short paragraphs and
+# headers.
+ParagraphInfo = namedtuple(
+    'ParagraphInfo',
+    [
+        'header',
+        'is_li',
+        'ilvl',
+        'numId',
+        'is_title',
+        'has_text',
+        'num_words',
+        'whole_line_bold',
+        'whole_line_italics',
     ],
 )
 
 
+###
+# Paragraph classification
+###
+
+
+@ensure_tag(['p'])
+def _classify_paragraph(p, meta_data):
+    w_namespace = get_namespace(p, 'w')
+    ilvl = get_ilvl(p, w_namespace)
+    numId = get_numId(p, w_namespace)
+    p_is_li = _is_li(p)
+    num_words, p_has_text = get_text_info(p, max_words=MAX_HEADER_WORDS)
+    whole_line_bold = whole_line_italics = None
+
+    header = False
+    if _is_upper_roman_level(meta_data, numId, ilvl):
+        header = 'h2'
+    if not header:
+        header = is_natural_header(p, meta_data.styles_dict)
+    if not header and not p_is_li:
+        # Check to see if this is a header because the font size is different
+        # than the normal font size.
+        # Since get_font_size is a method used before meta is created, just
+        # pass in styles_dict.
+        if DETECT_FONT_SIZE:
+            font_size = get_font_size(p, meta_data.styles_dict)
+            if font_size is not None:
+                if meta_data.font_sizes_dict[font_size]:
+                    header = meta_data.font_sizes_dict[font_size]
+
+        # If a paragraph is longer than eight words it is likely not supposed
+        # to be an h tag.
+        if not header and num_words <= MAX_HEADER_WORDS:
+            # Check to see if the full line is bold.
+            whole_line_bold, whole_line_italics = whole_line_styled(p)
+            if whole_line_bold or whole_line_italics:
+                header = 'h2'
+    if not header:
+        header = False
+    elif whole_line_bold is None:
+        whole_line_bold, whole_line_italics = whole_line_styled(p)
+
+    return ParagraphInfo(
+        header=header,
+        is_li=not header and p_is_li,
+        ilvl=ilvl,
+        numId=numId,
+        is_title=is_title(p),
+        has_text=p_has_text,
+        num_words=num_words,
+        whole_line_bold=whole_line_bold,
+        whole_line_italics=whole_line_italics,
+    )
+
+
+def get_paragraph_info(p, meta_data):
+    """
+    Return the ``ParagraphInfo`` for ``p``. If ``classify_paragraphs`` has
+    already been run the stored record is used, otherwise it is worked out
+    here.
+    """
+    paragraph_info = meta_data.paragraph_info
+    if paragraph_info is None:
+        return _classify_paragraph(p, meta_data)
+    info = paragraph_info.get(p)
+    if info is None:
+        info = paragraph_info[p] = _classify_paragraph(p, meta_data)
+    return info
+
+
+def classify_paragraphs(tree, meta_data):
+    """
+    Walk the document once and classify every p tag. Returns a copy of
+    ``meta_data`` that holds the results so the HTML building functions never
+    have to look at the same p tag twice.
+    """
+    paragraph_info = {}
+    meta_data = meta_data._replace(paragraph_info=paragraph_info)
+    w_namespace = get_namespace(tree, 'w')
+    for p in tree.iter('%sp' % w_namespace):
+        paragraph_info[p] = _classify_paragraph(p, meta_data)
+    return meta_data
+
+
 ###
 # Pre-processing
 ###
@@ -749,6 +1064,41 @@ def get_image_sizes(tree):
     return result
 
 
+def get_image_ids(tree):
+    """
+    Returns a set of the relationship ids of the images (drawing and pict
+    tags) in ``tree`` (document.xml).
+    """
+    w_namespace = get_namespace(tree, 'w')
+    image_ids = set()
+    # ``iter`` only takes more than one tag from lxml 3.0.
+    for tag in ('%sdrawing' % w_namespace, '%spict' % w_namespace):
+        for el in tree.iter(tag):
+            image_id = get_image_id.unchecked(el)
+            if image_id is not None:
+                image_ids.add(image_id)
+    return image_ids
+
+
+def get_media_plan(targets, media, image_ids=None):
+    """
+    Work out which media need to be read out of the docx, before any of them
+    are. ``targets`` are the relationship targets keyed by relationship id
+    (see ``get_relationship_info``, they do not have the images in
+    ``IMAGE_EXTENSIONS_TO_SKIP``), ``media`` the names of the media in the
+    docx keyed by their targets and ``image_ids`` the relationship ids of the
+    images the document uses (see ``get_image_ids``), None if they are not
+    known yet.
+
+    Returns the names of the media that are needed keyed by relationship id.
+    """
+    return dict(
+        (rel_id, media[target])
+        for rel_id, target in targets.items()
+        if target in media and (image_ids is None or rel_id in image_ids)
+    )
+
+
 def get_relationship_info(tree, media, image_sizes):
     """
     There is a separate file holds the targets to links as well as the targets
@@ -772,16 +1122,265 @@ def get_relationship_info(tree, media, image_sizes):
         if target in media:
             image_size = image_sizes.get(el_id)
             target = convert_image(media[target], image_size)
-        # cgi will replace things like & < > with &amp; &lt; &gt;
-        result[el_id] = cgi.escape(target)
+        result[el_id] = target
 
     return result
 
 
+def _convert_media(name, data, image_size, directory=None):
+    """
+    Convert the image ``name`` (its name in the docx) whose contents are
+    ``data``. If ``directory`` is passed in the image is extracted into it and
+    converted with ``convert_image``, otherwise it is converted in memory with
+    ``convert_image_data``. Returns the target of the converted image and its
+    contents if it is in memory (None otherwise).
+
+    This is run in ``RelationshipDict.image_pool``, so it can be a process.
+    """
+    if directory is None:
+        # Strip off the leading word/
+        return convert_image_data(name[len('word/'):], data, image_size)
+    path = os.path.join(directory, name)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as f:
+        f.write(data)
+    return convert_image(path, image_size), None
+
+
+class RelationshipDict(dict):
+    """
+    The targets of the relationships in a docx keyed by relationship id (see
+    ``get_relationship_info``), only the images are not taken out of the docx
+    until they are looked up. ``media`` maps the targets of the images to their
+    names in ``zip_file`` and the images are converted (see ``convert_image``)
+    using the sizes in ``image_sizes`` at the time they are looked up.
+
+    If the relationship ids of the images the document uses (``image_ids``)
+    are known only those images are ever read (see ``get_media_plan``), the
+    targets of the others are left as they are.
+
+    If ``extract_media`` is True the images are extracted next to the docx and
+    the target of an image is its path. Otherwise, or if the docx is not a file
+    on disk, the images are kept in memory and the target of an image is its
+    name in the docx. Either way ``open`` returns a file object for an image.
+
+    If there is an ``image_pool`` (a thread or process pool, anything with an
+    ``apply_async`` like ``multiprocessing.Pool``) images can be converted in
+    it ahead of time with ``load_images``, the conversion is only waited for
+    when the image is looked up.
+
+    If there is an ``image_cache`` (see ``docx2html.cache``) the converted
+    images are stored in it, keyed by the contents of the image and the size
+    it is converted to, and an image found in it is not converted again.
+    """
+
+    def __init__(
+            self,
+            targets,
+            media,
+            image_sizes,
+            zip_file,
+            extract_media=True,
+            image_pool=None,
+            image_cache=None,
+            timing_hook=None,
+            image_ids=None):
+        super(RelationshipDict, self).__init__(targets)
+        self._pending = get_media_plan(targets, media, image_ids)
+        self._media = media
+        self._image_sizes = image_sizes
+        self._zip_file = zip_file
+        # What to open the docx from again if it has been closed, its path or
+        # the file object it was read from.
+        self._zip_source = zip_file.filename or zip_file.fp
+        self._extract_media = extract_media
+        self.image_pool = image_pool
+        self.image_cache = image_cache
+        self.timing_hook = timing_hook
+        self._conversions = {}
+        self._image_data = {}
+        self._digests = {}
+
+    def __getitem__(self, rel_id):
+        if rel_id in self._pending or rel_id in self._conversions:
+            self._load_image(rel_id)
+        return super(RelationshipDict, self).__getitem__(rel_id)
+
+    def get(self, rel_id, default=None):
+        if rel_id not in self:
+            return default
+        return self[rel_id]
+
+    def itervalues(self):
+        for rel_id in self:
+            yield self[rel_id]
+
+    def iteritems(self):
+        for rel_id in self:
+            yield rel_id, self[rel_id]
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+    def open(self, rel_id):
+        """
+        Returns a file object for the target of ``rel_id``.
+        """
+        target = self[rel_id]
+        if rel_id in self._image_data:
+            return BytesIO(self._image_data[rel_id])
+        return open(target, 'rb')
+
+    def load_images(self, rel_ids):
+        """
+        Start converting the images for ``rel_ids`` in the ``image_pool``, so
+        they are ready by the time they are looked up. Does nothing if there
+        is no ``image_pool``.
+        """
+        if self.image_pool is None:
+            return
+        for rel_id in rel_ids:
+            if rel_id not in self._pending:
+                continue
+            args = self._get_conversion_args(rel_id)
+            if self._load_cached_image(rel_id, *args):
+                continue
+            self._conversions[rel_id] = (
+                args,
+                self.image_pool.apply_async(_convert_media, args),
+            )
+
+    def get_image_size(self, rel_id):
+        """
+        Returns the size in pixels of the image for ``rel_id``.
+        """
+        key = None
+        if rel_id in self._digests:
+            key = 'image_size:%s' % self._digests[rel_id]
+            image_size = self.image_cache.get(key)
+            if image_size is not None:
+                return image_size
+        with closing(self.open(rel_id)) as f:
+            image_size = _get_image_size_from_image(f)
+        if key is not None:
+            self.image_cache.set(key, image_size)
+        return image_size
+
+    def get_media_sizes(self):
+        """
+        The uncompressed sizes of the media in the docx, see
+        ``docx2html.metrics``.
+        """
+        return [
+            self._zip_file.getinfo(name).file_size
+            for name in self._media.values()
+        ]
+
+    def _open_zip_file(self):
+        # The docx is closed once it has been converted, if an image is looked
+        # up after that the docx needs to be opened again.
+        if self._zip_file.fp is None:
+            return ZipFile(self._zip_source)
+        return self._zip_file
+
+    def _get_conversion_args(self, rel_id):
+        name = self._pending.pop(rel_id)
+        zf = self._open_zip_file()
+        try:
+            data = zf.read(name)
+        finally:
+            if zf is not self._zip_file:
+                zf.close()
+        if self.image_cache is not None:
+            self._digests[rel_id] = get_digest(data)
+        directory = None
+        if self._extract_media and self._zip_file.filename is not None:
+            directory, _ = os.path.split(self._zip_file.filename)
+        return name, data, self._image_sizes.get(rel_id), directory
+
+    def _get_cache_key(self, rel_id, name, image_size):
+        _, extension = os.path.splitext(name)
+        return 'image:%s:%s:%s' % (
+            self._digests[rel_id],
+            image_size,
+            extension.lower(),
+        )
+
+    def _load_cached_image(self, rel_id, name, data, image_size, directory):
+        """
+        Load the image for ``rel_id`` from the ``image_cache``. Returns False
+        if it is not in there.
+        """
+        if self.image_cache is None:
+            return False
+        cached = self.image_cache.get(
+            self._get_cache_key(rel_id, name, image_size),
+        )
+        if cached is None:
+            return False
+        extension, data = cached
+        _, old_extension = os.path.splitext(name)
+        if extension != old_extension:
+            name = replace_ext(name, extension)
+        if directory is None:
+            # Strip off the leading word/
+            self._set_image(rel_id, name[len('word/'):], data)
+            return True
+        path = os.path.join(directory, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+        self._set_image(rel_id, path, None)
+        return True
+
+    def _cache_image(self, rel_id, name, image_size, target, data):
+        if self.image_cache is None:
+            return
+        if data is None:
+            with open(target, 'rb') as f:
+                data = f.read()
+        _, extension = os.path.splitext(target)
+        self.image_cache.set(
+            self._get_cache_key(rel_id, name, image_size),
+            (extension, data),
+        )
+
+    def _load_image(self, rel_id):
+        with time_stage(self.timing_hook, 'images') as stage:
+            stage.count = 1
+            if rel_id in self._conversions:
+                args, result = self._conversions.pop(rel_id)
+                target, data = result.get()
+            else:
+                args = self._get_conversion_args(rel_id)
+                if self._load_cached_image(rel_id, *args):
+                    return
+                target, data = _convert_media(*args)
+        name, _, image_size, _ = args
+        self._cache_image(rel_id, name, image_size, target, data)
+        self._set_image(rel_id, target, data)
+
+    def _set_image(self, rel_id, target, data):
+        if data is not None:
+            self._image_data[rel_id] = data
+        self[rel_id] = target
+
+
 def get_font_sizes_dict(tree, styles_dict):
     font_sizes_dict = defaultdict(int)
     # Get all the fonts sizes and how often they are used in a dict.
-    for p in tree.xpath('//w:p', namespaces=tree.nsmap):
+    p_tags = get_xpath('p', get_namespace(tree, 'w'))(tree)
+    _count_font_sizes(p_tags, styles_dict, font_sizes_dict)
+    return _get_header_font_sizes(font_sizes_dict)
+
+
+def _count_font_sizes(p_tags, styles_dict, font_sizes_dict):
+    for p in p_tags:
         # If this p tag is a natural header, skip it
         if is_natural_header(p, styles_dict):
             continue
@@ -792,6 +1391,8 @@ def get_font_sizes_dict(tree, styles_dict):
             continue
         font_sizes_dict[font_size] += 1
 
+
+def _get_header_font_sizes(font_sizes_dict):
     # Find the most used font size.
     most_used_font_size = -1
     highest_count = -1
@@ -813,73 +1414,249 @@ def get_font_sizes_dict(tree, styles_dict):
     return result
 
 
-def _get_document_data(f, image_handler=None):
+def _get_document_data(
+        f,
+        image_handler=None,
+        extract_media=True,
+        image_pool=None,
+        image_cache=None,
+        timing_hook=None,
+        with_metrics=False):
     '''
     ``f`` is a ``ZipFile`` that is open
     Extract out the document data, numbering data and the relationship data.
+    The images are only taken out of ``f`` once they are looked up in the
+    relationship dict (see ``RelationshipDict``), or converted in the
+    background if there is an ``image_pool``, unless they are in the
+    ``image_cache``.
+    Each stage is timed for ``timing_hook`` (see ``docx2html.timing``).
+    If ``with_metrics`` is True the ``DocumentMetrics`` of the document (see
+    ``docx2html.metrics``) are returned as well.
     '''
-    if image_handler is None:
-        def image_handler(image_id, relationship_dict):
-            return relationship_dict.get(image_id)
-
     document_xml = None
+    parser = etree.XMLParser(strip_cdata=False)
+    # This file holds all the content of the document.
+    if 'word/document.xml' in f.namelist():
+        info = f.getinfo('word/document.xml')
+        with time_stage(timing_hook, 'read') as stage:
+            member = f.open(info)
+            stage.count = info.compress_size
+        # document.xml is decompressed as it is parsed, so that is timed as
+        # part of parsing.
+        with time_stage(timing_hook, 'parse') as stage:
+            document_xml = _parse_zip_member(member, parser)
+            stage.count = info.file_size
+    with time_stage(timing_hook, 'package') as stage:
+        numbering_xml, relationship_xml, styles_xml, media = _get_package_data(
+            f,
+        )
+        stage.count = len(f.infolist())
+
+    with time_stage(timing_hook, 'styles') as stage:
+        styles_dict = get_style_dict(styles_xml)
+        stage.count = len(styles_dict)
+    with time_stage(timing_hook, 'image_sizes') as stage:
+        image_sizes = get_image_sizes(document_xml)
+        stage.count = len(image_sizes)
+    with time_stage(timing_hook, 'image_ids') as stage:
+        image_ids = get_image_ids(document_xml)
+        stage.count = len(image_ids)
+    font_sizes_dict = defaultdict(int)
+    if DETECT_FONT_SIZE:
+        with time_stage(timing_hook, 'font_sizes') as stage:
+            font_sizes_dict = get_font_sizes_dict(document_xml, styles_dict)
+            stage.count = len(font_sizes_dict)
+    meta_data = _build_meta_data(
+        numbering_xml=numbering_xml,
+        relationship_xml=relationship_xml,
+        styles_dict=styles_dict,
+        media=media,
+        image_sizes=image_sizes,
+        font_sizes_dict=font_sizes_dict,
+        image_handler=image_handler,
+        zip_file=f,
+        extract_media=extract_media,
+        image_pool=image_pool,
+        image_cache=image_cache,
+        timing_hook=timing_hook,
+        image_ids=image_ids,
+    )
+    # Every image with a size is used by the document.
+    meta_data.relationship_dict.load_images(image_sizes)
+    if with_metrics:
+        metrics = get_tree_metrics(document_xml, get_media_sizes(f))
+        return document_xml, meta_data, metrics
+    return document_xml, meta_data
+
+
+def _get_package_data(f):
+    '''
+    ``f`` is a ``ZipFile`` that is open
+    Parse everything but document.xml out of the docx. Returns the numbering,
+    relationship and styles xml and a dict of the names of the media in the
+    docx keyed by their relationship targets.
+    '''
     numbering_xml = None
     relationship_xml = None
     styles_xml = None
     parser = etree.XMLParser(strip_cdata=False)
-    path, _ = os.path.split(f.filename)
     media = {}
-    image_sizes = {}
     # Loop through the files in the zip file.
     for item in f.infolist():
-        # This file holds all the content of the document.
-        if item.filename == 'word/document.xml':
-            xml = f.read(item.filename)
-            document_xml = etree.fromstring(xml, parser)
         # This file tells document.xml how lists should look.
-        elif item.filename == 'word/numbering.xml':
-            xml = f.read(item.filename)
-            numbering_xml = etree.fromstring(xml, parser)
+        if item.filename == 'word/numbering.xml':
+            numbering_xml = _parse_zip_member(f.open(item), parser)
         elif item.filename == 'word/styles.xml':
-            xml = f.read(item.filename)
-            styles_xml = etree.fromstring(xml, parser)
+            styles_xml = _parse_zip_member(f.open(item), parser)
         # This file holds the targets for hyperlinks and images.
         elif item.filename == 'word/_rels/document.xml.rels':
-            xml = f.read(item.filename)
             try:
-                relationship_xml = etree.fromstring(xml, parser)
+                relationship_xml = _parse_zip_member(f.open(item), parser)
             except XMLSyntaxError:
                 relationship_xml = etree.fromstring('<xml></xml>', parser)
         if item.filename.startswith('word/media/'):
             # Strip off the leading word/
-            media[item.filename[len('word/'):]] = f.extract(
-                item.filename,
-                path,
-            )
-    # Close the file pointer.
-    f.close()
+            media[item.filename[len('word/'):]] = item.filename
+    return numbering_xml, relationship_xml, styles_xml, media
 
-    # Get dictionaries for the numbering and the relationships.
-    numbering_dict = get_numbering_info(numbering_xml)
-    image_sizes = get_image_sizes(document_xml)
-    relationship_dict = get_relationship_info(
+
+def _parse_zip_member(member, parser):
+    '''
+    Parse ``member``, a file in the docx opened with ``ZipFile.open``, a
+    chunk at a time as it is decompressed. No copy of the whole file is made
+    before it is parsed. ``member`` is closed once it has been parsed.
+    '''
+    with closing(member):
+        return etree.parse(member, parser).getroot()
+
+
+def _build_meta_data(
+        numbering_xml,
         relationship_xml,
+        styles_dict,
         media,
-        image_sizes
+        image_sizes,
+        font_sizes_dict,
+        image_handler,
+        zip_file,
+        extract_media=True,
+        image_pool=None,
+        image_cache=None,
+        timing_hook=None,
+        image_ids=None):
+    if image_handler is None:
+        def image_handler(image_id, relationship_dict):
+            return relationship_dict.get(image_id)
+
+    # Get dictionaries for the numbering and the relationships.
+    with time_stage(timing_hook, 'numbering') as stage:
+        numbering_dict = get_numbering_info(numbering_xml)
+        stage.count = len(numbering_dict)
+    with time_stage(timing_hook, 'relationships') as stage:
+        targets = get_relationship_info(relationship_xml, {}, image_sizes)
+        stage.count = len(targets)
+    # The images are converted as they are looked up, not up front.
+    relationship_dict = RelationshipDict(
+        targets,
+        media,
+        image_sizes,
+        zip_file,
+        extract_media=extract_media,
+        image_pool=image_pool,
+        image_cache=image_cache,
+        timing_hook=timing_hook,
+        image_ids=image_ids,
     )
-    styles_dict = get_style_dict(styles_xml)
-    font_sizes_dict = defaultdict(int)
-    if DETECT_FONT_SIZE:
-        font_sizes_dict = get_font_sizes_dict(document_xml, styles_dict)
-    meta_data = MetaData(
+    return MetaData(
         numbering_dict=numbering_dict,
         relationship_dict=relationship_dict,
         styles_dict=styles_dict,
         font_sizes_dict=font_sizes_dict,
         image_handler=image_handler,
         image_sizes=image_sizes,
+        deferred_srcs=[],
+        timing_hook=timing_hook,
     )
-    return document_xml, meta_data
+
+
+def _iter_body_children(document_file):
+    """
+    Parse ``document_file`` (document.xml) incrementally, yielding each child
+    of the body as soon as it has been completely parsed. The children are
+    still attached to the (partial) tree when they are yielded, it is up to
+    the caller to remove them once they are done with them.
+    """
+    body_tag = None
+    for event, el in etree.iterparse(
+            document_file,
+            events=('start', 'end'),
+            strip_cdata=False):
+        if event == 'start':
+            if body_tag is None:
+                # The first tag is the document tag.
+                body_tag = '%sbody' % get_namespace(el, 'w')
+            continue
+        parent = el.getparent()
+        if parent is not None and parent.tag == body_tag:
+            yield el
+
+
+def _release_element(el):
+    """
+    Free up an element of the tree being built by ``iterparse`` once it is no
+    longer needed.
+    """
+    el.clear()
+    parent = el.getparent()
+    if parent is not None:
+        parent.remove(el)
+
+
+def _get_streaming_document_data(
+        f,
+        image_handler=None,
+        extract_media=True,
+        image_pool=None,
+        image_cache=None):
+    '''
+    ``f`` is a ``ZipFile`` that is open
+    The same as ``_get_document_data`` only document.xml is not parsed, so
+    there are no image sizes yet. ``stream_html`` adds them as document.xml is
+    parsed.
+
+    If font sizes are being detected document.xml is scanned, one child of the
+    body at a time, for the font sizes first.
+    '''
+    if 'word/document.xml' not in f.namelist():
+        raise MalformedDocx('This docx does not have a word/document.xml')
+    numbering_xml, relationship_xml, styles_xml, media = _get_package_data(f)
+
+    styles_dict = get_style_dict(styles_xml)
+    font_sizes_dict = defaultdict(int)
+    if DETECT_FONT_SIZE:
+        for block in _iter_body_children(f.open('word/document.xml')):
+            w_namespace = get_namespace(block, 'w')
+            _count_font_sizes(
+                block.iter('%sp' % w_namespace),
+                styles_dict,
+                font_sizes_dict,
+            )
+            _release_element(block)
+        font_sizes_dict = _get_header_font_sizes(font_sizes_dict)
+    meta_data = _build_meta_data(
+        numbering_xml=numbering_xml,
+        relationship_xml=relationship_xml,
+        styles_dict=styles_dict,
+        media=media,
+        image_sizes={},
+        font_sizes_dict=font_sizes_dict,
+        image_handler=image_handler,
+        zip_file=f,
+        extract_media=extract_media,
+        image_pool=image_pool,
+        image_cache=image_cache,
+    )
+    return meta_data
 
 
 ###
@@ -923,21 +1700,20 @@ def build_list(li_nodes, meta_data):
 
     # Store the first list created (the root list) for the return value.
     root_ol = None
-    visited_nodes = []
+    visited_nodes = set()
     list_contents = []
 
     def _build_li(list_contents):
-        data = '<br />'.join(t for t in list_contents if t is not None)
-        return etree.XML('<li>%s</li>' % data)
+        return build_element('li', list_contents)
 
     def _build_non_li_content(el, meta_data):
         w_namespace = get_namespace(el, 'w')
         if el.tag == '%stbl' % w_namespace:
             new_el, visited_nodes = build_table(el, meta_data)
-            return etree.tostring(new_el), visited_nodes
+            return [new_el], visited_nodes
         elif el.tag == '%sp' % w_namespace:
-            return get_element_content(el, meta_data), [el]
-        if has_text(el):
+            return get_element_content(el, meta_data), set([el])
+        if has_text(el, meta_data):
             raise UnintendedTag('Did not expect %s' % el.tag)
 
     def _merge_lists(ilvl, current_ilvl, ol_dict, current_ol):
@@ -959,7 +1735,6 @@ def build_list(li_nodes, meta_data):
         return current_ol
 
     for li_node in li_nodes:
-        w_namespace = get_namespace(li_node, 'w')
         if not is_li(li_node, meta_data):
             # Get the content and visited nodes
             new_el, el_visited_nodes = _build_non_li_content(
@@ -967,7 +1742,7 @@ def build_list(li_nodes, meta_data):
                 meta_data,
             )
             list_contents.append(new_el)
-            visited_nodes.extend(el_visited_nodes)
+            visited_nodes.update(el_visited_nodes)
             continue
         if list_contents:
             li_el = _build_li(list_contents)
@@ -978,8 +1753,9 @@ def build_list(li_nodes, meta_data):
             li_node,
             meta_data,
         ))
-        ilvl = get_ilvl(li_node, w_namespace)
-        numId = get_numId(li_node, w_namespace)
+        info = get_paragraph_info(li_node, meta_data)
+        ilvl = info.ilvl
+        numId = info.numId
         list_type = get_ordered_list_type(meta_data, numId, ilvl)
 
         # If the ilvl is greater than the current_ilvl or the list id is
@@ -1027,7 +1803,7 @@ def build_list(li_nodes, meta_data):
                 current_ol = create_list(list_type)
 
         # Create the li element.
-        visited_nodes.extend(list(li_node.iter()))
+        visited_nodes.update(li_node.iter())
 
     # If a list item is the last thing in a document, then you will need to add
     # it here. Should probably figure out how to get the above logic to deal
@@ -1049,7 +1825,7 @@ def build_list(li_nodes, meta_data):
 
 
 @ensure_tag(['tr'])
-def build_tr(tr, meta_data, row_spans):
+def build_tr(tr, meta_data, table_grid):
     """
     This will return a single tr element, with all tds already populated.
     """
@@ -1057,19 +1833,17 @@ def build_tr(tr, meta_data, row_spans):
     # Create a blank tr element.
     tr_el = etree.Element('tr')
     w_namespace = get_namespace(tr, 'w')
-    visited_nodes = []
+    visited_nodes = set()
     for el in tr:
         if el in visited_nodes:
             continue
-        visited_nodes.append(el)
+        visited_nodes.add(el)
         # Find the table cells.
         if el.tag == '%stc' % w_namespace:
-            v_merge = get_v_merge(el)
-            # If there is a v_merge and it is not restart then this cell can be
-            # ignored.
-            if (
-                    v_merge is not None and
-                    v_merge.get('%sval' % w_namespace) != 'restart'):
+            span = table_grid[el]
+            # If this cell continues a rowspan from the row above then this
+            # cell can be ignored.
+            if span.rowspan == 0:
                 continue
 
             # Loop through each and build a list of all the content.
@@ -1084,26 +1858,23 @@ def build_tr(tr, meta_data, row_spans):
                 if is_li(td_content, meta_data):
                     # If it is a list, create the list and update
                     # visited_nodes.
-                    li_nodes = get_single_list_nodes_data(
-                        td_content,
-                        meta_data,
-                    )
+                    list_run = get_list_run(td_content, meta_data)
                     list_el, list_visited_nodes = build_list(
-                        li_nodes,
+                        list_run.nodes,
                         meta_data,
                     )
-                    visited_nodes.extend(list_visited_nodes)
-                    texts.append(etree.tostring(list_el))
+                    visited_nodes.update(list_visited_nodes)
+                    texts.append([list_el])
                 elif td_content.tag == '%stbl' % w_namespace:
                     table_el, table_visited_nodes = build_table(
                         td_content,
                         meta_data,
                     )
-                    visited_nodes.extend(table_visited_nodes)
-                    texts.append(etree.tostring(table_el))
+                    visited_nodes.update(table_visited_nodes)
+                    texts.append([table_el])
                 elif td_content.tag == '%stcPr' % w_namespace:
                     # Do nothing
-                    visited_nodes.append(td_content)
+                    visited_nodes.add(td_content)
                     continue
                 else:
                     text = get_element_content(
@@ -1113,21 +1884,14 @@ def build_tr(tr, meta_data, row_spans):
                     )
                     texts.append(text)
 
-            data = '<br />'.join(t for t in texts if t is not None)
-            td_el = etree.XML('<td>%s</td>' % data)
+            td_el = build_element('td', texts)
             # if there is a colspan then set it here.
-            colspan = get_grid_span(el)
-            if colspan > 1:
-                td_el.set('colspan', '%d' % colspan)
-            v_merge = get_v_merge(el)
+            if span.colspan > 1:
+                td_el.set('colspan', '%d' % span.colspan)
 
-            # If this td has a v_merge and it is restart then set the rowspan
-            # here.
-            if (
-                    v_merge is not None and
-                    v_merge.get('%sval' % w_namespace) == 'restart'):
-                rowspan = next(row_spans)
-                td_el.set('rowspan', '%d' % rowspan)
+            # If this td starts a rowspan then set the rowspan here.
+            if span.rowspan is not None:
+                td_el.set('rowspan', '%d' % span.rowspan)
 
             tr_el.append(td_el)
     return tr_el
@@ -1143,20 +1907,20 @@ def build_table(table, meta_data):
     table_el = etree.Element('table')
     w_namespace = get_namespace(table, 'w')
 
-    # Get the rowspan values for cells that have a rowspan.
-    row_spans = get_rowspan_data(table)
+    # Get the rowspan and colspan values for all of the cells.
+    table_grid = get_table_grid(table)
     for el in table:
         if el.tag == '%str' % w_namespace:
             # Create the tr element.
             tr_el = build_tr(
                 el,
                 meta_data,
-                row_spans,
+                table_grid,
             )
             # And append it to the table.
             table_el.append(tr_el)
 
-    visited_nodes = list(table.iter())
+    visited_nodes = set(table.iter())
     return table_el, visited_nodes
 
 
@@ -1164,15 +1928,10 @@ def build_table(table, meta_data):
 def get_t_tag_content(
         t, parent, remove_bold, remove_italics, meta_data):
     """
-    Generate the string data that for this particular t tag.
+    Generate the content for this particular t tag.
     """
     if t is None or t.text is None:
-        return ''
-
-    # Need to escape the text so that we do not accidentally put in text
-    # that is not valid XML.
-    # cgi will replace things like & < > with &amp; &lt; &gt;
-    text = cgi.escape(t.text)
+        return []
 
     # Wrap the text with any modifiers it might have (bold, italics or
     # underline)
@@ -1181,11 +1940,12 @@ def get_t_tag_content(
         is_underlined(parent)
     )
     el_is_italics = not remove_italics and is_italics(parent)
+    content = [t.text]
     if el_is_bold:
-        text = '<strong>%s</strong>' % text
+        content = [build_element('strong', [content])]
     if el_is_italics:
-        text = '<em>%s</em>' % text
-    return text
+        content = [build_element('em', [content])]
+    return content
 
 
 def _get_image_size_from_image(target):
@@ -1207,19 +1967,46 @@ def build_hyperlink(el, meta_data):
         remove_italics=True,
     )
     if not content:
-        return ''
+        return None
     if hyperlink_id in meta_data.relationship_dict:
         href = meta_data.relationship_dict[hyperlink_id]
         # Do not do any styling on hyperlinks
-        return '<a href="%s">%s</a>' % (href, content)
-    return ''
+        a_el = build_element('a', [content])
+        a_el.set('href', href)
+        return a_el
+    return None
+
+
+def _is_deferred(src):
+    # Anything with a ``get`` that waits for the result, like the
+    # ``AsyncResult`` from ``multiprocessing.pool.ThreadPool.apply_async``.
+    return not isinstance(src, basestring) and hasattr(src, 'get')
+
+
+def resolve_deferred_srcs(meta_data):
+    """
+    Wait for the image handler to finish with the images that were deferred
+    by ``build_image`` and fill in their src.
+    """
+    if not meta_data.deferred_srcs:
+        return
+    for img_el, src in meta_data.deferred_srcs:
+        _set_src(img_el, src.get())
+    del meta_data.deferred_srcs[:]
+
+
+def _set_src(img_el, src):
+    if src is None:
+        # The image handler does not have a src for this image.
+        src = ''
+    img_el.set('src', src)
 
 
 def build_image(el, meta_data):
     image_id = get_image_id(el)
     if image_id not in meta_data.relationship_dict:
         # This image does not have an image_id
-        return ''
+        return None
     src = meta_data.image_handler(
         image_id,
         meta_data.relationship_dict,
@@ -1228,44 +2015,59 @@ def build_image(el, meta_data):
         width, height = meta_data.image_sizes[image_id]
     else:
         target = meta_data.relationship_dict[image_id]
-        width, height = _get_image_size_from_image(target)
+        if isinstance(meta_data.relationship_dict, RelationshipDict):
+            # The image might only be in memory, or its size might be cached.
+            width, height = meta_data.relationship_dict.get_image_size(
+                image_id,
+            )
+        else:
+            width, height = _get_image_size_from_image(target)
+    img_el = etree.Element('img')
+    if _is_deferred(src):
+        # The image handler has not finished with the image yet (it is being
+        # uploaded somewhere for example), the src is filled in right before
+        # the html is serialized (see ``resolve_deferred_srcs``) so that the
+        # rest of the document can be built in the mean time.
+        if meta_data.deferred_srcs is None:
+            src = src.get()
+        else:
+            meta_data.deferred_srcs.append((img_el, src))
+            src = ''
+    _set_src(img_el, src)
     # Make sure the width and height are not zero
     if all((width, height)):
-        return '<img src="%s" height="%d" width="%d" />' % (
-            src,
-            height,
-            width,
-        )
-    else:
-        return '<img src="%s" />' % src
-    return ''
+        img_el.set('height', '%d' % height)
+        img_el.set('width', '%d' % width)
+    return img_el
 
 
 def get_text_run_content(el, meta_data, remove_bold, remove_italics):
     w_namespace = get_namespace(el, 'w')
-    text_output = ''
+    content = []
     for child in get_text_run_content_data(el):
         if child.tag == '%st' % w_namespace:
-            text_output += get_t_tag_content(
+            content.extend(get_t_tag_content.unchecked(
                 child,
                 el,
                 remove_bold,
                 remove_italics,
                 meta_data,
-            )
+            ))
         elif child.tag == '%sbr' % w_namespace:
-            text_output += '<br />'
+            content.append(etree.Element('br'))
         elif child.tag in (
                 '%spict' % w_namespace,
                 '%sdrawing' % w_namespace,
         ):
-            text_output += build_image(child, meta_data)
+            img_el = build_image(child, meta_data)
+            if img_el is not None:
+                content.append(img_el)
         else:
             raise SyntaxNotSupported(
                 '"%s" is not a supported content-containing '
                 'text run child.' % child.tag
             )
-    return text_output
+    return content
 
 
 @ensure_tag(['p', 'ins', 'smartTag', 'hyperlink'])
@@ -1278,7 +2080,8 @@ def get_element_content(
 ):
     """
     P tags are made up of several runs (r tags) of text. This function takes a
-    p tag and constructs the text that should be part of the p tag.
+    p tag and constructs the content (a list of text and html elements, see
+    ``build_element``) that should be part of the p tag.
 
     image_handler should be a callable that returns the desired ``src``
     attribute for a given image.
@@ -1290,12 +2093,14 @@ def get_element_content(
     # never be stripping bold/italics since that is only done on h tags
     if not is_td and is_header(p, meta_data):
         # Check to see if the whole line is bold or italics.
-        remove_bold, remove_italics = whole_line_styled(p)
+        info = get_paragraph_info(p, meta_data)
+        remove_bold = info.whole_line_bold
+        remove_italics = info.whole_line_italics
 
-    p_text = ''
+    content = []
     w_namespace = get_namespace(p, 'w')
     if len(p) == 0:
-        return ''
+        return content
     # Only these tags contain text that we care about (eg. We don't care about
     # delete tags)
     content_tags = (
@@ -1316,21 +2121,23 @@ def get_element_content(
         # Hyperlinks and insert tags need to be handled differently than
         # r and smart tags.
         if el.tag in ('%sins' % w_namespace, '%ssmartTag' % w_namespace):
-            p_text += get_element_content(
+            content.extend(get_element_content(
                 el,
                 meta_data,
                 remove_bold=remove_bold,
                 remove_italics=remove_italics,
-            )
+            ))
         elif el.tag == '%shyperlink' % w_namespace:
-            p_text += build_hyperlink(el, meta_data)
+            a_el = build_hyperlink(el, meta_data)
+            if a_el is not None:
+                content.append(a_el)
         elif el.tag == '%sr' % w_namespace:
-            p_text += get_text_run_content(
+            content.extend(get_text_run_content(
                 el,
                 meta_data,
                 remove_bold=remove_bold,
                 remove_italics=remove_italics,
-            )
+            ))
         else:
             raise SyntaxNotSupported(
                 'Content element "%s" not handled.' % el.tag
@@ -1338,7 +2145,38 @@ def get_element_content(
 
     # This function does not return a p tag since other tag types need this as
     # well (td, li).
-    return p_text
+    return content
+
+
+def _append_content(el, content):
+    for item in content:
+        if isinstance(item, basestring):
+            if not item:
+                continue
+            # Text goes after the last child, or directly in ``el`` if it does
+            # not have any children yet.
+            if len(el):
+                el[-1].tail = (el[-1].tail or '') + item
+            else:
+                el.text = (el.text or '') + item
+        else:
+            el.append(item)
+
+
+def build_element(tag, contents):
+    """
+    Build an html element named ``tag``. ``contents`` is a list of content
+    (lists of text and html elements, like the ones ``get_element_content``
+    returns), each content will be separated by a br tag. Any content that is
+    None is left out.
+    """
+    el = etree.Element(tag)
+    contents = [content for content in contents if content is not None]
+    for i, content in enumerate(contents):
+        if i != 0:
+            el.append(etree.Element('br'))
+        _append_content(el, content)
+    return el
 
 
 def _strip_tag(tree, tag):
@@ -1350,8 +2188,21 @@ def _strip_tag(tree, tag):
             el.getparent().remove(el)
 
 
-def get_zip_file_handler(file_path):
-    return ZipFile(file_path)
+def get_zip_file_handler(docx):
+    """
+    Returns a ``ZipFile`` for ``docx``, which is either the path to a docx, a
+    file like object holding one or the contents of one (a ``bytearray``,
+    ``buffer`` or ``memoryview``, a ``str`` is a path).
+    """
+    if isinstance(docx, BINARY_TYPES):
+        docx = BytesIO(docx)
+    elif hasattr(docx, 'read'):
+        try:
+            docx.seek(0, os.SEEK_CUR)
+        except (AttributeError, IOError):
+            # A zip file can only be read from something that can seek.
+            docx = BytesIO(docx.read())
+    return ZipFile(docx)
 
 
 def read_html_file(file_path):
@@ -1360,7 +2211,16 @@ def read_html_file(file_path):
     return html
 
 
-def convert(file_path, image_handler=None, fall_back=None, converter=None):
+def convert(
+        file_path,
+        image_handler=None,
+        fall_back=None,
+        converter=None,
+        extract_media=True,
+        image_pool=None,
+        image_cache=None,
+        cache=None,
+        timing_hook=None):
     """
     ``file_path`` is a path to the file on the file system that you want to be
         converted to html.
@@ -1371,103 +2231,671 @@ def convert(file_path, image_handler=None, fall_back=None, converter=None):
         only be called if for whatever reason the conversion fails.
     ``converter`` is a function to convert a document that is not docx to docx
         (examples in docx2html.converters)
+    ``extract_media`` if True (the default) the images that are used are
+        extracted next to ``file_path`` and the ``relationship_dict`` holds
+        their paths. If False they are only held in memory and the
+        ``relationship_dict`` holds their names, use
+        ``relationship_dict.open(image_id)`` to read them.
+    ``image_pool`` is a thread or process pool (like
+        ``multiprocessing.pool.ThreadPool``) to convert the images in while
+        the html is built.
+    ``image_cache`` is a cache (see ``docx2html.cache``) to keep converted
+        images in, so the same image is only converted once.
+    ``cache`` is a cache (see ``docx2html.cache``) to keep the html in, keyed
+        by the contents of ``file_path`` and the options that change the html.
+        If the html is in the cache it is returned as is, nothing is converted
+        or extracted and the ``image_handler`` is not called. Nothing is
+        cached if the ``image_handler`` or ``converter`` can not be imported
+        (a lambda, a closure or a bound method) and does not have a
+        ``cache_key`` (see ``get_callable_key``).
+    ``timing_hook`` is called with the time each stage of the conversion
+        took (see ``docx2html.timing``).
 
     Returns html extracted from ``file_path``
     """
+    cache_key = None
+    if cache is not None:
+        with open(file_path, 'rb') as f:
+            digest = get_digest(f.read())
+        _, extension = os.path.splitext(file_path)
+        media_directory = None
+        if extract_media:
+            # The images are extracted next to ``file_path`` and the html has
+            # their paths.
+            media_directory = os.path.dirname(file_path)
+        cache_key = _get_html_cache_key(
+            digest,
+            extension,
+            image_handler,
+            converter,
+            media_directory,
+        )
+    if cache_key is not None:
+        html = cache.get(cache_key)
+        if html is not None:
+            return html
+
+    zf, html = _open_docx(file_path, fall_back, converter)
+    if zf is None:
+        return html
+
+    html = _convert_zip_file(
+        zf,
+        image_handler,
+        extract_media,
+        image_pool,
+        image_cache,
+        timing_hook,
+    )
+    if cache_key is not None:
+        cache.set(cache_key, html)
+    return html
+
+
+def convert_bytes(
+        data,
+        extension='.docx',
+        image_handler=None,
+        fall_back=None,
+        converter=None,
+        image_pool=None,
+        image_cache=None,
+        cache=None,
+        timing_hook=None):
+    """
+    The same as ``convert`` for a document that is in memory instead of on
+    disk. ``data`` is the contents of the document (a ``str``, ``bytearray``,
+    ``buffer`` or ``memoryview``) and ``extension`` is the kind of document it
+    is (``'.docx'``, ``'.html'``, ``'.doc'`` ...), the leading dot can be left
+    off.
+
+    Nothing is written to disk for a docx. The images are kept in memory (as
+    when ``convert`` is passed ``extract_media=False``), the
+    ``image_handler`` can read them with ``relationship_dict.open(image_id)``.
+
+    Any other kind of document is written to a scratch directory for the
+    ``converter``, which is removed once the docx it made has been read back
+    into memory. ``fall_back`` is called with the path of the document in the
+    scratch directory.
+    """
+    extension = normalize_ext(extension)
+    cache_key = None
+    if cache is not None:
+        cache_key = _get_html_cache_key(
+            get_digest(data),
+            extension,
+            image_handler,
+            converter,
+            None,
+        )
+    if cache_key is not None:
+        html = cache.get(cache_key)
+        if html is not None:
+            return html
+
+    if extension == '.html' or extension == '.htm':
+        if hasattr(data, 'tobytes'):
+            # A memoryview, which ``str`` does not hand the contents of.
+            return data.tobytes()
+        return str(data)
+
+    if extension != '.docx':
+        data, html = _convert_data_to_docx(
+            data,
+            extension,
+            fall_back,
+            converter,
+        )
+        if data is None:
+            return html
+    if isinstance(data, str):
+        # A str is taken to be a path by ``get_zip_file_handler``.
+        data = buffer(data)
+
+    html = _convert_zip_file(
+        _get_docx_zip_file(data),
+        image_handler,
+        False,
+        image_pool,
+        image_cache,
+        timing_hook,
+    )
+    if cache_key is not None:
+        cache.set(cache_key, html)
+    return html
+
+
+def convert_fileobj(
+        fp,
+        extension='.docx',
+        image_handler=None,
+        fall_back=None,
+        converter=None,
+        image_pool=None,
+        image_cache=None,
+        cache=None,
+        timing_hook=None):
+    """
+    The same as ``convert_bytes`` for the document in ``fp``, a file like
+    object. If it is a docx and there is no ``cache`` it is read straight from
+    ``fp`` (if ``fp`` can seek) instead of being read into memory first.
+    """
+    if normalize_ext(extension) != '.docx' or cache is not None:
+        return convert_bytes(
+            fp.read(),
+            extension,
+            image_handler,
+            fall_back,
+            converter,
+            image_pool,
+            image_cache,
+            cache,
+            timing_hook,
+        )
+    return _convert_zip_file(
+        _get_docx_zip_file(fp),
+        image_handler,
+        False,
+        image_pool,
+        image_cache,
+        timing_hook,
+    )
+
+
+def _convert_data_to_docx(data, extension, fall_back, converter):
+    """
+    Convert ``data``, the contents of a document of kind ``extension``, to
+    docx in a scratch directory. Returns a tuple of the contents of the docx
+    and None, or None and the html from ``fall_back``.
+    """
+    if converter is None:
+        raise FileNotDocx('The file passed in is not a docx.')
+    directory = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(directory, 'document%s' % extension)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        docx_path, html = _convert_to_docx(file_path, fall_back, converter)
+        if docx_path is None:
+            return None, html
+        with open(docx_path, 'rb') as f:
+            return f.read(), None
+    finally:
+        shutil.rmtree(directory)
+
+
+def _convert_zip_file(
+        zf,
+        image_handler,
+        extract_media,
+        image_pool,
+        image_cache,
+        timing_hook):
+    """
+    Returns the html for the docx ``zf`` (an open ``ZipFile``), which is
+    closed once it has been converted.
+    """
+    try:
+        # Need to populate the xml based on word/document.xml
+        tree, meta_data = _get_document_data(
+            zf,
+            image_handler,
+            extract_media,
+            image_pool,
+            image_cache,
+            timing_hook,
+        )
+        return create_html(tree, meta_data)
+    finally:
+        zf.close()
+
+
+def _get_html_cache_key(
+        digest,
+        extension,
+        image_handler,
+        converter,
+        media_directory):
+    """
+    The key for the html of a document, ``digest`` is the hash of its
+    contents and ``media_directory`` is the directory the images are
+    extracted to (None if they are not). Returns None if the html can not be
+    cached, see ``get_callable_key``.
+    """
+    callable_keys = (
+        get_callable_key(image_handler),
+        get_callable_key(converter),
+    )
+    if None in callable_keys:
+        return None
+    if media_directory is not None:
+        # The paths in the html are relative to the working directory when
+        # ``media_directory`` is.
+        media_directory = (media_directory, os.path.abspath(media_directory))
+    options = (extension.lower(),) + callable_keys + (
+        media_directory,
+        DETECT_FONT_SIZE,
+        DEFAULT_LIST_NUMBERING_STYLE,
+    )
+    return 'html:%s:%s' % (digest, ':'.join(str(o) for o in options))
+
+
+def convert_iter(
+        file_path,
+        image_handler=None,
+        fall_back=None,
+        converter=None,
+        extract_media=True,
+        image_pool=None,
+        image_cache=None):
+    """
+    Takes the same arguments as ``convert`` (other than ``cache`` and
+    ``timing_hook``), only instead of returning the html
+    all at once this yields the html one heading, paragraph, list or table at a
+    time, in document order, as soon as it has been built. For a docx::
+
+        '<html>%s</html>' % ''.join(convert_iter(file_path))
+
+    is the same as ``convert(file_path)``. If ``file_path`` is already html, or
+    the ``fall_back`` is used, the html is yielded all at once instead.
+
+    The document is parsed as it is converted (see ``stream_html``), so the
+    first piece of html is ready long before the document has been parsed and
+    only a small part of the document is held in memory at a time.
+    """
+    zf, html = _open_docx(file_path, fall_back, converter)
+    if zf is None:
+        yield html
+        return
+
+    fragments = _iter_docx_html(
+        zf,
+        image_handler,
+        extract_media,
+        image_pool,
+        image_cache,
+    )
+    for fragment in fragments:
+        yield fragment
+
+
+def convert_to_stream(
+        file_path,
+        output,
+        image_handler=None,
+        fall_back=None,
+        converter=None,
+        extract_media=True,
+        image_pool=None,
+        image_cache=None):
+    """
+    The same as ``convert`` only the html is written to ``output`` (a file
+    like object) as it is built, with only a small part of the document in
+    memory at a time (see ``convert_iter``). Use this for very large
+    documents.
+    """
+    zf, html = _open_docx(file_path, fall_back, converter)
+    if zf is None:
+        output.write(html)
+        return
+
+    output.write('<html>')
+    fragments = _iter_docx_html(
+        zf,
+        image_handler,
+        extract_media,
+        image_pool,
+        image_cache,
+    )
+    for fragment in fragments:
+        output.write(fragment)
+    output.write('</html>')
+
+
+def _iter_docx_html(
+        zf,
+        image_handler,
+        extract_media,
+        image_pool,
+        image_cache):
+    """
+    Yield the html for each block of the docx ``zf`` (an open ``ZipFile``).
+    ``zf`` is closed once the document has been converted.
+    """
+    try:
+        meta_data = _get_streaming_document_data(
+            zf,
+            image_handler,
+            extract_media,
+            image_pool,
+            image_cache,
+        )
+        html_els = stream_html(zf.open('word/document.xml'), meta_data)
+        for html_el in html_els:
+            resolve_deferred_srcs(meta_data)
+            yield serialize_html(html_el)
+    finally:
+        zf.close()
+
+
+def _open_docx(file_path, fall_back, converter):
+    """
+    Returns a tuple of an open ``ZipFile`` for the docx version of
+    ``file_path`` and None. If there is nothing to convert (``file_path`` is
+    already html, or the conversion to docx failed and there is a
+    ``fall_back``) then the tuple is None and the html.
+    """
     file_base, extension = os.path.splitext(os.path.basename(file_path))
 
     if extension == '.html' or extension == '.htm':
-        return read_html_file(file_path)
+        return None, read_html_file(file_path)
 
-    # Create the converted file as a file in the same dir with the
-    # same name only with a .docx extension
-    docx_path = replace_ext(file_path, '.docx')
     if extension == '.docx':
         # If the file is already html, just leave it in place.
         docx_path = file_path
     else:
-        if converter is None:
-            raise FileNotDocx('The file passed in is not a docx.')
-        converter(docx_path, file_path)
-        if not os.path.isfile(docx_path):
-            if fall_back is None:
-                raise ConversionFailed('Conversion to docx failed.')
-            else:
-                return fall_back(file_path)
+        docx_path, html = _convert_to_docx(file_path, fall_back, converter)
+        if docx_path is None:
+            return None, html
+    return _get_docx_zip_file(docx_path), None
+
 
+def _convert_to_docx(file_path, fall_back, converter):
+    """
+    Convert ``file_path`` to docx with ``converter``, into a file in the same
+    dir with the same name only with a .docx extension. Returns a tuple of the
+    path to the docx and None, or None and the html from ``fall_back`` if the
+    conversion failed.
+    """
+    if converter is None:
+        raise FileNotDocx('The file passed in is not a docx.')
+    docx_path = replace_ext(file_path, '.docx')
+    converter(docx_path, file_path)
+    if not os.path.isfile(docx_path):
+        if fall_back is None:
+            raise ConversionFailed('Conversion to docx failed.')
+        else:
+            return None, fall_back(file_path)
+    return docx_path, None
+
+
+def _get_docx_zip_file(docx):
+    """
+    ``get_zip_file_handler`` only a ``docx`` that is not a zip file raises
+    ``MalformedDocx``.
+    """
     try:
         # Docx files are actually just zip files.
-        zf = get_zip_file_handler(docx_path)
+        return get_zip_file_handler(docx)
     except BadZipfile:
         raise MalformedDocx('This file is not a docx')
 
-    # Need to populate the xml based on word/document.xml
-    tree, meta_data = _get_document_data(zf, image_handler)
-    return create_html(tree, meta_data)
-
 
-def create_html(tree, meta_data):
+def create_html(tree, meta_data, with_metrics=False):
+    """
+    Returns the html for ``tree`` (document.xml). If ``with_metrics`` is True
+    a tuple of the html and the ``DocumentMetrics`` of ``tree`` (see
+    ``docx2html.metrics``) is returned instead.
+    """
+    metrics = None
+    if with_metrics:
+        media_sizes = ()
+        if isinstance(meta_data.relationship_dict, RelationshipDict):
+            media_sizes = meta_data.relationship_dict.get_media_sizes()
+        metrics = get_tree_metrics(tree, media_sizes)
 
     # Start the return value
     new_html = etree.Element('html')
 
     w_namespace = get_namespace(tree, 'w')
-    visited_nodes = []
+    # lxml hands back the same proxy object for a node as long as a reference
+    # to it is alive, and the set holds one, so identity based membership is
+    # safe here.
+    visited_nodes = set()
 
     _strip_tag(tree, '%ssectPr' % w_namespace)
+    timing_hook = meta_data.timing_hook
+    with time_stage(timing_hook, 'classify') as stage:
+        meta_data = classify_paragraphs(tree, meta_data)._replace(
+            list_indexes={},
+        )
+        stage.count = len(meta_data.paragraph_info)
+    # Only time building the elements if someone is listening, it is done
+    # once for every element.
+    build_times = None
+    if timing_hook is not None:
+        build_times = {}
     for el in tree.iter():
         # The way lists are handled could double visit certain elements; keep
         # track of which elements have been visited and skip any that have been
         # visited already.
         if el in visited_nodes:
             continue
-        header_value = is_header(el, meta_data)
-        if is_header(el, meta_data):
-            p_text = get_element_content(el, meta_data)
-            if p_text == '':
-                continue
-            new_html.append(
-                etree.XML('<%s>%s</%s>' % (
-                    header_value,
-                    p_text,
-                    header_value,
-                ))
+        if build_times is None:
+            new_el = _build_html_element(el, meta_data, visited_nodes)
+        else:
+            new_el = _time_build_html_element(
+                el,
+                meta_data,
+                visited_nodes,
+                build_times,
             )
-        elif el.tag == '%sp' % w_namespace:
-            # Strip out titles.
-            if is_title(el):
-                continue
-            if is_li(el, meta_data):
-                # Parse out the needed info from the node.
-                li_nodes = get_single_list_nodes_data(el, meta_data)
-                new_el, list_visited_nodes = build_list(
-                    li_nodes,
-                    meta_data,
-                )
-                visited_nodes.extend(list_visited_nodes)
-            # Handle generic p tag here.
-            else:
-                p_text = get_element_content(el, meta_data)
-                # If there is not text do not add an empty tag.
-                if p_text == '':
-                    continue
-
-                new_el = etree.XML('<p>%s</p>' % p_text)
+        if new_el is not None:
             new_html.append(new_el)
+    if build_times is not None:
+        for stage, (wall_time, cpu_time, count) in build_times.items():
+            timing_hook(stage, wall_time, cpu_time, count)
+    if meta_data.deferred_srcs:
+        # Waiting on the image handler.
+        with time_stage(timing_hook, 'images') as stage:
+            stage.count = len(meta_data.deferred_srcs)
+            resolve_deferred_srcs(meta_data)
+    with time_stage(timing_hook, 'serialize') as stage:
+        html = serialize_html(new_html)
+        stage.count = len(html)
+    if with_metrics:
+        return html, metrics
+    return html
 
-        elif el.tag == '%stbl' % w_namespace:
-            table_el, table_visited_nodes = build_table(
-                el,
+
+def _time_build_html_element(el, meta_data, visited_nodes, build_times):
+    """
+    The same as ``_build_html_element``, only the time it took is added to
+    ``build_times`` under the kind of element that was built.
+    """
+    wall_time = time.time()
+    cpu_time = time.clock()
+    new_el = _build_html_element(el, meta_data, visited_nodes)
+    wall_time = time.time() - wall_time
+    cpu_time = time.clock() - cpu_time
+    if new_el is None:
+        stage = 'skipped'
+    elif new_el.tag in ('ol', 'ul'):
+        stage = 'lists'
+    elif new_el.tag == 'table':
+        stage = 'tables'
+    elif new_el.tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+        stage = 'headers'
+    else:
+        stage = 'paragraphs'
+    totals = build_times.get(stage, (0, 0, 0))
+    build_times[stage] = (
+        totals[0] + wall_time,
+        totals[1] + cpu_time,
+        totals[2] + 1,
+    )
+    return new_el
+
+
+def _build_html_element(el, meta_data, visited_nodes):
+    """
+    Build the html for ``el``, one of the tags ``create_html`` walks over, and
+    add everything that was used to build it to ``visited_nodes``. Returns
+    None if ``el`` does not turn into html on its own.
+    """
+    w_namespace = get_namespace(el, 'w')
+    visited_nodes.add(el)
+    header_value = is_header(el, meta_data)
+    if header_value:
+        content = get_element_content(el, meta_data)
+        if not content:
+            return None
+        return build_element(header_value, [content])
+    elif el.tag == '%sp' % w_namespace:
+        # Strip out titles.
+        if get_paragraph_info(el, meta_data).is_title:
+            return None
+        if is_li(el, meta_data):
+            # Parse out the needed info from the node.
+            list_run = get_list_run(el, meta_data)
+            new_el, list_visited_nodes = build_list(
+                list_run.nodes,
                 meta_data,
             )
-            visited_nodes.extend(table_visited_nodes)
-            new_html.append(table_el)
+            visited_nodes.update(list_visited_nodes)
+            return new_el
+        # Handle generic p tag here.
+        content = get_element_content(el, meta_data)
+        # If there is not text do not add an empty tag.
+        if not content:
+            return None
+        return build_element('p', [content])
+    elif el.tag == '%stbl' % w_namespace:
+        table_el, table_visited_nodes = build_table(
+            el,
+            meta_data,
+        )
+        visited_nodes.update(table_visited_nodes)
+        return table_el
+    return None
+
+
+def _starts_list(el, meta_data):
+    """
+    Returns True if ``_build_html_element`` would build a list starting at
+    ``el``.
+    """
+    return (
+        _is_p(el) and
+        not is_header(el, meta_data) and
+        not get_paragraph_info(el, meta_data).is_title and
+        is_li(el, meta_data)
+    )
+
+
+def _list_run_is_complete(li, meta_data):
+    """
+    While streaming only part of the body has been parsed. Returns True if the
+    list run starting at ``li`` would not change if more of the body was
+    parsed.
+    """
+    list_run = get_list_run(li, meta_data)
+    list_index = get_list_index(li.getparent(), meta_data)
+    last = list_run.nodes[-1]
+    position = list_index.positions[last]
+    next_numId = list_index.next_li_numIds[position]
+    if (
+            last is not li and
+            is_li(last, meta_data) and
+            next_numId != list_run.numId):
+        # The run ended on its last list item, which is only certain once the
+        # list item after it has been parsed.
+        return next_numId is not None
+    # Otherwise the run ended on a tag that stopped it, or it ran out of tags.
+    # Tags that stop a run always have text.
+    return any(
+        has_text(el, meta_data)
+        for el in list_index.children[position + 1:]
+    )
+
+
+def stream_html(document_file, meta_data):
+    """
+    Parse ``document_file`` (document.xml) one child of the body at a time and
+    yield the html elements for it in document order, the same elements
+    ``create_html`` would build. Children of the body are thrown away as soon
+    as they have been converted, only a list that is still being parsed is
+    held on to.
+
+    The sizes of the images in each child of the body are added to
+    ``meta_data.image_sizes`` as it is parsed, and the images are loaded (see
+    ``RelationshipDict.load_images``).
+    """
+    w_namespace = None
+    # The body that ``iterparse`` is building can already hold the start of
+    # the next child, how much of it depends on where the reads of
+    # ``document_file`` ended. Children are moved to ``body`` once they have
+    # been completely parsed, so looking ahead for the end of a list (or
+    # classifying a paragraph) only ever sees finished tags.
+    body = None
+    # Paragraphs are classified as they are seen, and the list indexes can not
+    # be cached since the children of the body change as the document is
+    # parsed.
+    meta_data = meta_data._replace(paragraph_info={}, list_indexes=None)
+    visited_nodes = set()
+    pending = deque()
+    # Checking whether a list is complete looks at all of the pending tags, so
+    # only check again once the number of pending tags has doubled.
+    check_at = [1]
+
+    def _ready(block, done):
+        if done or block in visited_nodes:
+            return True
+        if not _starts_list(block, meta_data):
+            return True
+        if len(pending) < check_at[0]:
+            return False
+        if _list_run_is_complete(block, meta_data):
+            return True
+        check_at[0] = len(pending) * 2
+        return False
+
+    def _drain(done):
+        while pending and _ready(pending[0], done):
+            block = pending.popleft()
+            check_at[0] = 1
+            for el in block.iter():
+                if el in visited_nodes:
+                    continue
+                new_el = _build_html_element(el, meta_data, visited_nodes)
+                if new_el is not None:
+                    yield new_el
+            for el in block.iter():
+                visited_nodes.discard(el)
+                meta_data.paragraph_info.pop(el, None)
+            _release_element(block)
+
+    for block in _iter_body_children(document_file):
+        if w_namespace is None:
+            w_namespace = get_namespace(block, 'w')
+            parsed_body = block.getparent()
+            body = etree.Element(parsed_body.tag, nsmap=parsed_body.nsmap)
+        if block.tag == '%ssectPr' % w_namespace:
+            _release_element(block)
             continue
+        body.append(block)
+        _strip_tag(block, '%ssectPr' % w_namespace)
+        image_sizes = get_image_sizes(block)
+        meta_data.image_sizes.update(image_sizes)
+        if isinstance(meta_data.relationship_dict, RelationshipDict):
+            meta_data.relationship_dict.load_images(image_sizes)
+        pending.append(block)
+        for new_el in _drain(done=False):
+            yield new_el
+    for new_el in _drain(done=True):
+        yield new_el
+
+
+# A br or img tag the way ``etree.tostring`` writes it. Attribute values are
+# quoted with " unless they have one in them, then they are quoted with '.
+VOID_ELEMENTS_REGEX = re.compile(
+    r'''<((?:br|img)(?=[\s>])(?:[^>"']|"[^"]*"|'[^']*')*)>''',
+)
+
 
-        # Keep track of visited_nodes
-        visited_nodes.append(el)
+def serialize_html(html_el):
     result = etree.tostring(
-        new_html,
+        html_el,
         method='html',
         with_tail=True,
     )
@@ -1475,16 +2903,7 @@ def create_html(tree, meta_data):
 
 
 def _make_void_elements_self_close(html):
-    #XXX Hack not sure how to get etree to do this by default.
-    void_tags = [
-        r'br',
-        r'img',
-    ]
-    for tag in void_tags:
-        regex = re.compile(r'<%s.*?>' % tag)
-        matches = regex.findall(html)
-        for match in matches:
-            new_tag = match.strip('<>')
-            new_tag = '<%s />' % new_tag
-            html = re.sub(match, new_tag, html)
-    return html
+    """
+    Close the br and img tags in ``html`` (``<br />``), in one pass.
+    """
+    return VOID_ELEMENTS_REGEX.sub(r'<\1 />', html)
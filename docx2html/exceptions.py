@@ -20,3 +20,25 @@ class UnintendedTag(Docx2HtmlException):
 
 class SyntaxNotSupported(Docx2HtmlException):
     pass
+
+
+class WorkerException(Docx2HtmlException):
+    """
+    Stands in for an exception raised in a worker process that could not be
+    sent back (lxml's ``XMLSyntaxError`` can not be unpickled for example).
+    ``exception_type`` is the name of the class of the exception and
+    ``traceback`` is the traceback from the worker, as text.
+    """
+
+    def __init__(self, exception_type, message, traceback):
+        super(WorkerException, self).__init__(
+            exception_type,
+            message,
+            traceback,
+        )
+        self.exception_type = exception_type
+        self.message = message
+        self.traceback = traceback
+
+    def __str__(self):
+        return '%s: %s' % (self.exception_type, self.message)
@@ -0,0 +1,194 @@
+"""
+How big and complicated a document is, without converting it.
+
+``scan`` only reads the directory of the docx and parses document.xml one
+block at a time, so it is cheap enough to run on every document before
+deciding how (or where) to convert it::
+
+    metrics = scan('path/to/file.docx')
+    if metrics.num_paragraphs > 10000 or metrics.media_bytes > 50000000:
+        send_to_the_slow_queue(file_path)
+
+``_get_document_data`` and ``create_html`` can hand back the same metrics
+along with their results (pass ``with_metrics=True``).
+"""
+from collections import namedtuple
+from zipfile import ZipFile, BadZipfile
+
+from lxml import etree
+
+from docx2html.exceptions import MalformedDocx
+
+DocumentMetrics = namedtuple(
+    'DocumentMetrics',
+    [
+        # The number of p tags, including the ones in tables.
+        'num_paragraphs',
+        # The number of tables, including the ones in other tables.
+        'num_tables',
+        # The most rows in a table.
+        'max_table_rows',
+        # The most columns in a row of a table (counting spanned columns).
+        'max_table_columns',
+        # The most levels a list goes down, 0 if there are no lists.
+        'list_depth',
+        # The number of files in word/media.
+        'num_media',
+        # The size of the files in word/media once they are uncompressed.
+        'media_bytes',
+    ],
+)
+
+
+class _MetricsCounter(object):
+    """
+    Counts the metrics from the start and end events of the elements of
+    document.xml, from ``etree.iterparse`` or ``etree.iterwalk``.
+    """
+
+    def __init__(self):
+        self.w_namespace = None
+        self.num_paragraphs = 0
+        self.num_tables = 0
+        self.max_table_rows = 0
+        self.max_table_columns = 0
+        self.list_depth = 0
+        # The number of rows in each table that is open and the number of
+        # columns in each row that is open, innermost last.
+        self._table_rows = []
+        self._row_columns = []
+
+    def tag(self, name):
+        return '%s%s' % (self.w_namespace, name)
+
+    def _val(self, el, name):
+        child = el.find(self.tag(name))
+        if child is None:
+            return None
+        return child.get(self.tag('val'))
+
+    def start(self, el):
+        if self.w_namespace is None:
+            # The first tag is the document tag.
+            self.w_namespace = '{%s}' % el.nsmap['w']
+        if el.tag == self.tag('tbl'):
+            self._table_rows.append(0)
+        elif el.tag == self.tag('tr') and self._table_rows:
+            self._table_rows[-1] += 1
+            self._row_columns.append(0)
+
+    def end(self, el):
+        tag = el.tag
+        if tag == self.tag('p'):
+            self.num_paragraphs += 1
+        elif tag == self.tag('tc') and self._row_columns:
+            # The properties of a tc are only there once it has ended.
+            grid_span = None
+            tc_pr = el.find(self.tag('tcPr'))
+            if tc_pr is not None:
+                grid_span = self._val(tc_pr, 'gridSpan')
+            self._row_columns[-1] += int(grid_span or 1)
+        elif tag == self.tag('tr') and self._row_columns:
+            self.max_table_columns = max(
+                self.max_table_columns,
+                self._row_columns.pop(),
+            )
+        elif tag == self.tag('tbl') and self._table_rows:
+            self.num_tables += 1
+            self.max_table_rows = max(
+                self.max_table_rows,
+                self._table_rows.pop(),
+            )
+        elif tag == self.tag('numPr'):
+            # A numId of 0 turns the numbering off.
+            if self._val(el, 'numId') not in (None, '0'):
+                ilvl = self._val(el, 'ilvl') or 0
+                self.list_depth = max(self.list_depth, int(ilvl) + 1)
+
+    def handle(self, event, el):
+        if event == 'start':
+            self.start(el)
+        else:
+            self.end(el)
+
+    def get_metrics(self, media_sizes):
+        return DocumentMetrics(
+            num_paragraphs=self.num_paragraphs,
+            num_tables=self.num_tables,
+            max_table_rows=self.max_table_rows,
+            max_table_columns=self.max_table_columns,
+            list_depth=self.list_depth,
+            num_media=len(media_sizes),
+            media_bytes=sum(media_sizes),
+        )
+
+
+def get_media_sizes(zip_file):
+    """
+    The uncompressed sizes of the files in word/media of ``zip_file``, from
+    the directory of the zip file (nothing is read).
+    """
+    return [
+        item.file_size
+        for item in zip_file.infolist()
+        if item.filename.startswith('word/media/')
+    ]
+
+
+def get_tree_metrics(tree, media_sizes=()):
+    """
+    The ``DocumentMetrics`` of ``tree``, a parsed document.xml. ``media_sizes``
+    are the sizes of the media in the docx (see ``get_media_sizes``).
+    """
+    counter = _MetricsCounter()
+    if tree is not None:
+        for event, el in etree.iterwalk(tree, events=('start', 'end')):
+            counter.handle(event, el)
+    return counter.get_metrics(media_sizes)
+
+
+def scan_zip_file(zip_file):
+    """
+    The same as ``scan`` for ``zip_file``, a docx that is an open
+    ``ZipFile``.
+    """
+    if 'word/document.xml' not in zip_file.namelist():
+        raise MalformedDocx('This docx does not have a word/document.xml')
+    counter = _MetricsCounter()
+    document = None
+    body = None
+    events = etree.iterparse(
+        zip_file.open('word/document.xml'),
+        events=('start', 'end'),
+    )
+    for event, el in events:
+        counter.handle(event, el)
+        if event == 'start':
+            if document is None:
+                document = el
+            elif body is None:
+                # The blocks are in the body tag, or right in the document
+                # tag if there is no body.
+                body = el if el.tag == counter.tag('body') else document
+            continue
+        # Only one child of the body (a p or tbl for example) is held in
+        # memory at a time.
+        if body is not None and el.getparent() is body:
+            el.clear()
+            body.remove(el)
+    return counter.get_metrics(get_media_sizes(zip_file))
+
+
+def scan(file_path):
+    """
+    Returns the ``DocumentMetrics`` of the docx at ``file_path`` without
+    converting it. Raises ``MalformedDocx`` if it is not a docx.
+    """
+    try:
+        zip_file = ZipFile(file_path)
+    except BadZipfile:
+        raise MalformedDocx('This file is not a docx')
+    try:
+        return scan_zip_file(zip_file)
+    finally:
+        zip_file.close()
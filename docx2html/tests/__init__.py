@@ -1,4 +1,5 @@
 from unittest import TestCase
+from os import path
 import re
 
 from docx2html.core import (
@@ -15,6 +16,18 @@ def assert_html_equal(actual_html, expected_html):
     ), actual_html
 
 
+def get_fixture(filename):
+    """
+    The path to ``filename`` in the fixtures directory.
+    """
+    return path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        filename,
+    )
+
+
 def collapse_html(html):
     """
     Remove insignificant whitespace from the html.
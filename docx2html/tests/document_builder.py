@@ -108,18 +108,36 @@ class DocxBuilder(object):
     @classmethod
     def table(self, num_rows, num_columns, text):
 
-        def _tc(cell_value):
-            template = env.get_template(templates['tc'])
-            return template.render(p_tag=cell_value)
-
         def _tr(rows, text):
-            tcs = [_tc(text.next()) for _ in range(rows)]
-            template = env.get_template(templates['tr'])
-            return template.render(table_cells=tcs)
+            tcs = [self.tc(text.next()) for _ in range(rows)]
+            return self.tr(tcs)
 
         trs = [_tr(num_rows, text) for _ in range(num_rows)]
+        return self.table_from_rows(trs)
+
+    @classmethod
+    def table_from_rows(self, table_rows):
         template = env.get_template(templates['table'])
-        return template.render(table_rows=trs)
+        return template.render(table_rows=table_rows)
+
+    @classmethod
+    def tr(self, table_cells):
+        template = env.get_template(templates['tr'])
+        return template.render(table_cells=table_cells)
+
+    @classmethod
+    def tc(self, p_tag, grid_span=None, v_merge=None):
+        """
+        ``v_merge`` is either ``'restart'`` to start a rowspan or
+        ``'continue'`` to continue the rowspan of the cell above.
+        """
+        template = env.get_template(templates['tc'])
+        kwargs = {
+            'p_tag': p_tag,
+            'grid_span': grid_span,
+            'v_merge': v_merge,
+        }
+        return template.render(**kwargs)
 
     @classmethod
     def drawing(self, r_id):
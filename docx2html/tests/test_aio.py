@@ -0,0 +1,116 @@
+import mock
+import os
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
+
+from nose.tools import assert_raises
+
+from docx2html import aio, convert, convert_iter
+from docx2html.exceptions import MalformedDocx
+from docx2html.tests import get_fixture
+from docx2html.tests.test_docx import _copy_file_to_tmp_dir
+
+
+def test_convert():
+    file_path = get_fixture('simple.docx')
+    executor = ThreadPool(2)
+    try:
+        callback_results = []
+        result = aio.convert(
+            file_path,
+            executor,
+            callback=callback_results.append,
+        )
+        html = result.get()
+    finally:
+        executor.close()
+    assert html == convert(file_path)
+    assert callback_results == [html]
+
+
+def test_convert_many_with_limiter():
+    file_paths = [
+        get_fixture('simple.docx'),
+        get_fixture('nested_lists.docx'),
+        get_fixture('headers.docx'),
+    ]
+    executor = ThreadPool(3)
+    other_work_done = threading.Event()
+    running = []
+    most_running = [0]
+
+    def convert_after_other_work(file_path, **options):
+        # The documents waiting on the limiter do not hold any of the
+        # workers, so work handed to the executor after them gets one.
+        other_work_done.wait(5)
+        assert other_work_done.is_set()
+        running.append(file_path)
+        most_running[0] = max(most_running[0], len(running))
+        html = convert(file_path, **options)
+        running.remove(file_path)
+        return html
+    try:
+        with mock.patch('docx2html.aio._convert', convert_after_other_work):
+            results = aio.convert_many(
+                file_paths,
+                executor,
+                limiter=aio.Limiter(1),
+            )
+            executor.apply_async(other_work_done.set)
+            htmls = [result.get(10) for result in results]
+    finally:
+        executor.close()
+    assert htmls == [convert(file_path) for file_path in file_paths]
+    assert most_running == [1]
+
+
+def test_convert_with_limiter_exception():
+    # A document that fails to convert does not hold up the rest.
+    fd, bad_file_path = tempfile.mkstemp(suffix='.docx')
+    os.close(fd)
+    executor = ThreadPool(2)
+    callback_results = []
+    try:
+        bad_result, result = aio.convert_many(
+            [bad_file_path, get_fixture('simple.docx')],
+            executor,
+            limiter=aio.Limiter(1),
+            callback=callback_results.append,
+        )
+        assert_raises(MalformedDocx, bad_result.get, 10)
+        assert not bad_result.successful()
+        html = result.get(10)
+    finally:
+        executor.close()
+        os.remove(bad_file_path)
+    assert html == convert(get_fixture('simple.docx'))
+    assert callback_results == [html]
+
+
+def test_deferred_image_handler():
+    # The image handler can hand back the result of an upload that has not
+    # finished yet.
+    upload_pool = ThreadPool(1)
+
+    def image_handler(image_id, relationship_dict):
+        return upload_pool.apply_async(lambda: 'uploaded/%s' % image_id)
+    try:
+        file_path, _ = _copy_file_to_tmp_dir(
+            get_fixture('has_image.docx'),
+            'has_image.docx',
+        )
+        html = convert(file_path, image_handler=image_handler)
+        file_path, _ = _copy_file_to_tmp_dir(
+            get_fixture('has_image.docx'),
+            'has_image.docx',
+        )
+        fragments = list(convert_iter(file_path, image_handler=image_handler))
+    finally:
+        upload_pool.close()
+    expected_html = (
+        '<html><p>AAA<img src="uploaded/rId2" height="55" width="260" />'
+        '</p></html>'
+    )
+    assert html == expected_html
+    assert '<html>%s</html>' % ''.join(fragments) == expected_html
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from contextlib import closing
+from os import path
+from zipfile import ZipFile
+
+from docx2html import convert, convert_many
+from docx2html.exceptions import MalformedDocx, WorkerException
+from docx2html.tests import get_fixture
+
+
+FILENAMES = [
+    'simple.docx',
+    'nested_lists.docx',
+    'table_col_row_span.docx',
+    'headers.docx',
+    'shift_enter.docx',
+]
+
+
+def test_convert_many_ordered():
+    file_paths = [get_fixture(filename) for filename in FILENAMES]
+    results = list(convert_many(iter(file_paths), workers=2, max_in_flight=3))
+    assert [r.file_path for r in results] == file_paths
+    for result in results:
+        assert result.exception is None
+        assert result.html == convert(result.file_path)
+
+
+def test_convert_many_unordered():
+    file_paths = [get_fixture(filename) for filename in FILENAMES]
+    results = list(convert_many(file_paths, workers=2, ordered=False))
+    assert sorted(r.file_path for r in results) == sorted(file_paths)
+    for result in results:
+        assert result.html == convert(result.file_path)
+
+
+def test_convert_many_exception():
+    # A bad file does not stop the rest from being converted.
+    fd, bad_file_path = tempfile.mkstemp(suffix='.docx')
+    os.close(fd)
+    file_paths = [bad_file_path, get_fixture('simple.docx')]
+    try:
+        bad_result, result = convert_many(file_paths, workers=2)
+    finally:
+        os.remove(bad_file_path)
+    assert bad_result.html is None
+    assert isinstance(bad_result.exception, MalformedDocx)
+    assert result.html == convert(result.file_path)
+
+
+def test_convert_many_threads():
+    file_paths = [get_fixture(filename) for filename in FILENAMES] * 2
+    results = list(convert_many(
+        file_paths,
+        workers=4,
+        threads=True,
+        # Does not need to be picklable.
+        image_handler=lambda image_id, relationship_dict: image_id,
+    ))
+    assert [r.file_path for r in results] == file_paths
+    for result in results:
+        assert result.exception is None
+        assert result.html == convert(result.file_path)
+
+
+def test_convert_many_malformed_document_xml():
+    # lxml's XMLSyntaxError can not be unpickled, it is sent back from the
+    # worker processes as a WorkerException.
+    dp = tempfile.mkdtemp()
+    bad_file_path = path.join(dp, 'malformed.docx')
+    with closing(ZipFile(get_fixture('simple.docx'))) as old_zf:
+        with closing(ZipFile(bad_file_path, 'w')) as zf:
+            for name in old_zf.namelist():
+                data = old_zf.read(name)
+                if name == 'word/document.xml':
+                    data = data[:len(data) // 2]
+                zf.writestr(name, data)
+    file_paths = [bad_file_path, get_fixture('simple.docx')] * 2
+    try:
+        for ordered in (True, False):
+            results = list(convert_many(
+                file_paths,
+                workers=2,
+                ordered=ordered,
+            ))
+            assert len(results) == 4
+            bad_results = [r for r in results if r.html is None]
+            assert len(bad_results) == 2
+            for bad_result in bad_results:
+                assert bad_result.file_path == bad_file_path
+                assert isinstance(bad_result.exception, WorkerException)
+                assert bad_result.exception.exception_type == (
+                    'XMLSyntaxError'
+                )
+                assert 'XMLSyntaxError' in bad_result.exception.traceback
+        # Threads hand back the exception itself.
+        bad_result = list(convert_many(
+            file_paths,
+            workers=2,
+            threads=True,
+        ))[0]
+        assert not isinstance(bad_result.exception, WorkerException)
+    finally:
+        shutil.rmtree(dp)
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+
+from docx2html.cache import DirectoryCache, MemoryCache
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # Using a makes b the least recently used.
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+    assert cache.stats() == {'hits': 3, 'misses': 1}
+
+
+def test_directory_cache_is_shared():
+    directory = tempfile.mkdtemp()
+    try:
+        DirectoryCache(directory).set('a', ('.gif', 'GIF89a'))
+        cache = DirectoryCache(directory)
+        assert cache.get('a') == ('.gif', 'GIF89a')
+        assert cache.get('b') is None
+        assert cache.stats() == {'hits': 1, 'misses': 1}
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_directory_cache_evicts_to_max_size():
+    directory = tempfile.mkdtemp()
+    try:
+        cache = DirectoryCache(directory, max_size=2500)
+        for key in 'abc':
+            cache.set(key, 'x' * 1000)
+        assert sum(
+            os.path.getsize(os.path.join(directory, filename))
+            for filename in os.listdir(directory)
+        ) <= 2500
+        assert cache.get('c') is not None
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,134 @@
+import shutil
+import sys
+import tempfile
+from multiprocessing.pool import ThreadPool
+from os import path
+
+from nose.tools import assert_raises
+
+from docx2html import convert
+from docx2html.cache import MemoryCache
+from docx2html.converters import ConverterPool
+from docx2html.exceptions import ConversionFailed
+from docx2html.tests import get_fixture
+
+# Stands in for the abiword shell, "converting" a file copies the docx that
+# has the same name from the fixtures.
+SHELL = r'''
+import os, shutil, sys, time
+sys.stdout.write('started %%s\n> ' %% os.getpid())
+sys.stdout.flush()
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    file_path, docx_path = line.split('"')[1::2]
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    if name == 'slow':
+        time.sleep(10)
+    if name == 'crash':
+        sys.exit(1)
+    fixture = os.path.join(%r, name + '.docx')
+    if os.path.exists(fixture):
+        shutil.copyfile(fixture, docx_path)
+    sys.stdout.write('%%s\n> ' %% os.getpid())
+    sys.stdout.flush()
+''' % path.join(path.abspath(path.dirname(__file__)), '..', 'fixtures')
+
+
+def _get_pool(**kwargs):
+    return ConverterPool(
+        args=[sys.executable, '-c', SHELL],
+        prompt='> ',
+        **kwargs
+    )
+
+
+def _get_doc(directory, name):
+    # Each document gets a directory of its own in ``directory``, the shell
+    # picks the fixture to copy by the name of the document.
+    file_path = path.join(tempfile.mkdtemp(dir=directory), name + '.doc')
+    open(file_path, 'w').close()
+    return file_path
+
+
+def test_converter_pool():
+    pool = _get_pool(workers=2)
+    directory = tempfile.mkdtemp()
+    expected_html = convert(get_fixture('simple.docx'))
+    threads = ThreadPool(4)
+    try:
+        html = convert(_get_doc(directory, 'simple'), converter=pool)
+        assert html == expected_html
+        results = [
+            threads.apply_async(
+                convert,
+                (_get_doc(directory, 'simple'),),
+                {'converter': pool},
+            )
+            for _ in range(4)
+        ]
+        for result in results:
+            assert result.get(30) == expected_html
+    finally:
+        threads.close()
+        pool.close()
+        shutil.rmtree(directory)
+
+
+def test_converter_pool_reuses_processes():
+    pool = _get_pool(workers=1, max_jobs=2)
+    directory = tempfile.mkdtemp()
+    try:
+        file_path = _get_doc(directory, 'simple')
+        pool(file_path.replace('.doc', '.docx'), file_path)
+        first_process = pool._idle.get()
+        pool._idle.put(first_process)
+        file_path = _get_doc(directory, 'simple')
+        pool(file_path.replace('.doc', '.docx'), file_path)
+        # The process was recycled after its second job.
+        assert pool._idle.get() is None
+        pool._idle.put(None)
+        assert not first_process.is_alive()
+    finally:
+        pool.close()
+        shutil.rmtree(directory)
+
+
+def test_converter_pool_timeout_and_crash():
+    pool = _get_pool(workers=1, timeout=1)
+    directory = tempfile.mkdtemp()
+    try:
+        assert_raises(
+            ConversionFailed,
+            convert,
+            _get_doc(directory, 'slow'),
+            converter=pool,
+        )
+        assert_raises(
+            ConversionFailed,
+            convert,
+            _get_doc(directory, 'crash'),
+            converter=pool,
+        )
+        # A new process is started for the next file.
+        html = convert(_get_doc(directory, 'simple'), converter=pool)
+        assert html.startswith('<html>')
+    finally:
+        pool.close()
+        shutil.rmtree(directory)
+
+
+def test_converter_pool_cache_key():
+    pool = _get_pool()
+    other_pool = ConverterPool()
+    assert pool.cache_key == _get_pool().cache_key
+    assert pool.cache_key != other_pool.cache_key
+
+    # The html built with a pool can be cached.
+    file_path = get_fixture('simple.docx')
+    cache = MemoryCache()
+    html = convert(file_path, converter=pool, cache=cache)
+    assert convert(file_path, converter=_get_pool(), cache=cache) == html
+    assert convert(file_path, converter=other_pool, cache=cache) == html
+    assert cache.stats() == {'hits': 1, 'misses': 2}
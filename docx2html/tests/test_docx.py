@@ -1,20 +1,36 @@
 import mock
 import tempfile
+from contextlib import closing
 import shutil
-from os import path
+import sys
+from StringIO import StringIO
+from multiprocessing.pool import ThreadPool
+from os import listdir, path
 from zipfile import ZipFile
 from nose.plugins.skip import SkipTest
 from nose.tools import assert_raises
 
-from docx2html.tests import collapse_html
-from docx2html import convert
+from docx2html.tests import DEFAULT_IMAGE_HANDLER, collapse_html
+from docx2html import (
+    convert,
+    convert_bytes,
+    convert_fileobj,
+    convert_iter,
+    convert_to_stream,
+)
+from docx2html.cache import MemoryCache
 from docx2html.core import (
     _get_document_data,
     DETECT_FONT_SIZE,
+    create_html,
+    get_zip_file_handler,
 )
 from docx2html.exceptions import (
     ConversionFailed,
+    MalformedDocx,
 )
+from docx2html.tests.document_builder import DocxBuilder as DXB
+from docx2html.timing import StageTimes
 
 
 def assert_html_equal(actual_html, expected_html):
@@ -448,6 +464,280 @@ def test_has_image_using_image_handler():
     ''')
 
 
+def test_has_image_with_no_src():
+    filename = 'has_image.docx'
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'has_image.docx',
+    )
+    new_file_path, _ = _copy_file_to_tmp_dir(file_path, filename)
+    pool = ThreadPool(1)
+
+    def image_handler(*args, **kwargs):
+        return None
+
+    def deferred_image_handler(*args, **kwargs):
+        return pool.apply_async(image_handler)
+    try:
+        for handler in (image_handler, deferred_image_handler):
+            actual_html = convert(new_file_path, image_handler=handler)
+            assert_html_equal(actual_html, '''
+            <html><p>AAA<img src="" height="55" width="260" /></p></html>
+            ''')
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def test_has_image_in_memory():
+    filename = 'has_image.docx'
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'has_image.docx',
+    )
+    new_file_path, dp = _copy_file_to_tmp_dir(file_path, filename)
+
+    images = {}
+
+    def image_handler(image_id, relationship_dict):
+        with closing(relationship_dict.open(image_id)) as f:
+            images[relationship_dict[image_id]] = f.read()
+        return 'test'
+    actual_html = convert(
+        new_file_path,
+        image_handler=image_handler,
+        extract_media=False,
+    )
+    assert_html_equal(actual_html, '''
+    <html><p>AAA<img src="test" height="55" width="260" /></p></html>
+    ''')
+    # The image was handed over without being extracted.
+    assert images.keys() == ['media/image1.gif']
+    assert images['media/image1.gif'].startswith('GIF')
+    assert not path.exists(path.join(dp, 'word'))
+
+
+def test_has_image_from_memory():
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'has_image.docx',
+    )
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    images = {}
+
+    def image_handler(image_id, relationship_dict):
+        with closing(relationship_dict.open(image_id)) as f:
+            images[relationship_dict[image_id]] = f.read()
+        return 'test'
+    docxs = [bytearray(data), buffer(data), StringIO(data)]
+    if sys.version_info >= (2, 7):
+        docxs.append(memoryview(data))
+    for docx in docxs:
+        zf = get_zip_file_handler(docx)
+        try:
+            tree, meta_data = _get_document_data(zf, image_handler)
+            html = create_html(tree, meta_data)
+        finally:
+            zf.close()
+        assert_html_equal(html, '''
+        <html><p>AAA<img src="test" height="55" width="260" /></p></html>
+        ''')
+        # There is nowhere to extract the image to, it is kept in memory.
+        assert images.keys() == ['media/image1.gif']
+        assert images['media/image1.gif'].startswith('GIF')
+
+
+def test_unused_media_is_not_read():
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'has_image.docx',
+    )
+    dp = tempfile.mkdtemp()
+    new_file_path = path.join(dp, 'has_unused_media.docx')
+    image_type = (
+        'http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships/image'
+    )
+    unused = ''.join(
+        '<Relationship Id="%s" Type="%s" Target="%s"/>' % (
+            r_id,
+            image_type,
+            target,
+        )
+        for r_id, target in (
+            ('rId98', 'media/image2.gif'),
+            ('rId99', 'media/chart.emf'),
+        )
+    )
+    with closing(ZipFile(file_path)) as old_zf:
+        with closing(ZipFile(new_file_path, 'w')) as zf:
+            for name in old_zf.namelist():
+                data = old_zf.read(name)
+                if name == 'word/_rels/document.xml.rels':
+                    data = data.replace(
+                        '</Relationships>',
+                        unused + '</Relationships>',
+                    )
+                zf.writestr(name, data)
+            zf.writestr('word/media/image2.gif', old_zf.read(
+                'word/media/image1.gif',
+            ))
+            zf.writestr('word/media/chart.emf', 'EMF')
+
+    relationship_dicts = []
+
+    def image_handler(image_id, relationship_dict):
+        relationship_dicts.append(relationship_dict)
+        return relationship_dict[image_id]
+    try:
+        convert(new_file_path, image_handler=image_handler)
+        # Only the image that is in the document was taken out of the docx.
+        assert listdir(path.join(dp, 'word', 'media')) == ['image1.gif']
+        relationship_dict, = relationship_dicts
+        assert relationship_dict['rId98'] == 'media/image2.gif'
+        assert 'rId99' not in relationship_dict
+    finally:
+        shutil.rmtree(dp)
+
+
+def test_has_image_using_image_pool():
+    filename = 'resized_image.docx'
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'resized_image.docx',
+    )
+    new_file_path, dp = _copy_file_to_tmp_dir(file_path, filename)
+    expected_html = convert(new_file_path).replace(dp, '')
+
+    new_file_path, dp = _copy_file_to_tmp_dir(file_path, filename)
+    image_pool = ThreadPool(2)
+    try:
+        with mock.patch.object(
+                image_pool,
+                'apply_async',
+                wraps=image_pool.apply_async) as apply_async:
+            actual_html = convert(new_file_path, image_pool=image_pool)
+    finally:
+        image_pool.close()
+    # The image was converted in the pool.
+    assert apply_async.call_count == 1
+    assert actual_html.replace(dp, '') == expected_html
+
+
+def test_has_image_using_image_cache():
+    filename = 'resized_image.docx'
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'resized_image.docx',
+    )
+    image_cache = MemoryCache()
+    new_file_path, dp = _copy_file_to_tmp_dir(file_path, filename)
+    expected_html = convert(
+        new_file_path,
+        image_cache=image_cache,
+    ).replace(dp, '')
+
+    # The second time around the images are not converted again.
+    new_file_path, dp = _copy_file_to_tmp_dir(file_path, filename)
+    with mock.patch('docx2html.core._convert_image') as _convert_image:
+        actual_html = convert(new_file_path, image_cache=image_cache)
+    assert not _convert_image.called
+    assert actual_html.replace(dp, '') == expected_html
+    assert image_cache.hits == image_cache.misses
+
+
+def test_convert_using_cache():
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'simple.docx',
+    )
+    cache = MemoryCache()
+    expected_html = convert(file_path, cache=cache)
+    assert cache.stats() == {'hits': 0, 'misses': 1}
+
+    with mock.patch('docx2html.core._get_document_data') as get_data:
+        actual_html = convert(file_path, cache=cache)
+    assert not get_data.called
+    assert actual_html == expected_html
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+    # A different image handler can change the html, so it is not a hit.
+    convert(file_path, image_handler=DEFAULT_IMAGE_HANDLER, cache=cache)
+    assert cache.stats() == {'hits': 1, 'misses': 2}
+
+    # A lambda has no key that only it can have, so its html is not cached.
+    convert(file_path, image_handler=lambda *args: 'test', cache=cache)
+    convert(file_path, image_handler=lambda *args: 'test', cache=cache)
+    assert cache.stats() == {'hits': 1, 'misses': 2}
+    assert len(cache) == 2
+
+
+def test_convert_using_cache_extracts_media():
+    # The html has the paths of the images that were extracted next to the
+    # docx, so the same docx somewhere else is not a hit.
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'has_image.docx',
+    )
+    cache = MemoryCache()
+    dps = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+    try:
+        htmls = []
+        for dp in dps:
+            new_file_path = path.join(dp, 'has_image.docx')
+            shutil.copy(file_path, new_file_path)
+            htmls.append(convert(new_file_path, cache=cache))
+            assert listdir(path.join(dp, 'word', 'media')) == ['image1.gif']
+        assert cache.stats() == {'hits': 0, 'misses': 2}
+        assert htmls[0].replace(dps[0], dps[1]) == htmls[1]
+        # Not extracting the images does not depend on where the docx is.
+        for dp in dps:
+            convert(
+                path.join(dp, 'has_image.docx'),
+                extract_media=False,
+                cache=cache,
+            )
+        assert cache.stats() == {'hits': 1, 'misses': 3}
+    finally:
+        for dp in dps:
+            shutil.rmtree(dp)
+
+
+def test_convert_with_timing_hook():
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'tables_in_lists.docx',
+    )
+    stage_times = StageTimes()
+    html = convert(file_path, timing_hook=stage_times)
+    assert html == convert(file_path)
+    stages = ('read', 'parse', 'numbering', 'styles', 'lists', 'serialize')
+    for stage in stages:
+        assert stage in stage_times.stages, stage
+    assert stage_times.stages['lists']['count'] == 1
+    assert stage_times.stages['serialize']['count'] == len(html)
+
+
 def test_attachment_is_tiff():
     filename = 'attachment_is_tiff.docx'
     file_path = path.join(
@@ -757,3 +1047,150 @@ def test_html_files(patch_zip_handler, patch_read):
 
     html = convert(file_path)
     assert html == 'test'
+
+
+def test_convert_to_stream():
+    # Streaming the conversion needs to build the exact same html as building
+    # it all at once.
+    filenames = [
+        'simple.docx',
+        'nested_lists.docx',
+        'tables_in_lists.docx',
+        'table_col_row_span.docx',
+        'headers.docx',
+    ]
+    for filename in filenames:
+        file_path = path.join(
+            path.abspath(path.dirname(__file__)),
+            '..',
+            'fixtures',
+            filename,
+        )
+        output = StringIO()
+        convert_to_stream(file_path, output)
+        assert output.getvalue() == convert(file_path), filename
+
+
+def test_convert_iter():
+    # Each block is yielded on its own, joined together they are the same
+    # html as building it all at once.
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'simple.docx',
+    )
+    fragments = list(convert_iter(file_path))
+    assert len(fragments) > 1
+    assert '<html>%s</html>' % ''.join(fragments) == convert(file_path)
+
+
+def test_convert_iter_large_document():
+    # A document that is parsed over many reads, with lists that are still
+    # open at the end of most of them.
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'nested_lists.docx',
+    )
+    levels = [0, 1, 2, 3, 4, 5, 4, 3, 2, 1]
+    body = []
+    for i in range(3000):
+        body.append(DXB.li(
+            text='item %d' % i,
+            ilvl=levels[i % len(levels)],
+            numId=(i // 50) % 2 + 1,
+        ))
+        if i % 7 == 0:
+            body.append(DXB.p_tag(
+                'Paragraph number %d has more than eight words in it.' % i,
+            ))
+    xml = DXB.xml('<w:body>%s</w:body>' % ''.join(body)).encode('utf-8')
+    assert len(xml) > 500000
+    dp = tempfile.mkdtemp()
+    new_file_path = path.join(dp, 'large_lists.docx')
+    with closing(ZipFile(file_path)) as old_zf:
+        with closing(ZipFile(new_file_path, 'w')) as zf:
+            for name in old_zf.namelist():
+                data = old_zf.read(name)
+                if name == 'word/document.xml':
+                    data = xml
+                zf.writestr(name, data)
+    try:
+        fragments = list(convert_iter(new_file_path))
+        assert '<html>%s</html>' % ''.join(fragments) == convert(
+            new_file_path,
+        )
+    finally:
+        shutil.rmtree(dp)
+
+
+def test_convert_bytes():
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'has_image.docx',
+    )
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    expected_html = convert(file_path, extract_media=False)
+    docxs = [data, bytearray(data), buffer(data)]
+    if sys.version_info >= (2, 7):
+        docxs.append(memoryview(data))
+    for docx in docxs:
+        assert convert_bytes(docx) == expected_html
+    assert convert_fileobj(StringIO(data)) == expected_html
+
+    cache = MemoryCache()
+    assert convert_bytes(data, cache=cache) == expected_html
+    assert convert_fileobj(StringIO(data), cache=cache) == expected_html
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+    assert convert_bytes('<p>AAA</p>', extension='.html') == '<p>AAA</p>'
+    # The leading dot can be left off.
+    assert convert_bytes(data, extension='DOCX') == expected_html
+    assert convert_fileobj(StringIO(data), extension='docx') == expected_html
+    assert convert_bytes('<p>AAA</p>', extension='html') == '<p>AAA</p>'
+    assert_raises(MalformedDocx, convert_bytes, 'not a docx')
+
+
+def test_convert_bytes_with_converter():
+    file_path = path.join(
+        path.abspath(path.dirname(__file__)),
+        '..',
+        'fixtures',
+        'simple.docx',
+    )
+    converted = []
+
+    def copy_converter(docx_path, doc_path):
+        with open(doc_path, 'rb') as f:
+            converted.append(f.read())
+        shutil.copy(file_path, docx_path)
+    html = convert_bytes(
+        'doc data',
+        extension='.doc',
+        converter=copy_converter,
+    )
+    assert html == convert(file_path)
+    assert converted == ['doc data']
+
+    def fall_back(doc_path):
+        with open(doc_path, 'rb') as f:
+            return f.read()
+    html = convert_bytes(
+        'doc data',
+        extension='.doc',
+        converter=_converter,
+        fall_back=fall_back,
+    )
+    assert html == 'doc data'
+    assert_raises(
+        ConversionFailed,
+        convert_bytes,
+        'doc data',
+        extension='.doc',
+        converter=_converter,
+    )
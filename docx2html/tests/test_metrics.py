@@ -0,0 +1,83 @@
+from zipfile import ZipFile
+
+from lxml import etree
+from nose.tools import assert_raises
+
+from docx2html.core import _get_document_data, create_html
+from docx2html.exceptions import MalformedDocx
+from docx2html.metrics import DocumentMetrics, get_tree_metrics, scan
+from docx2html.tests import get_fixture
+from docx2html.tests.document_builder import DocxBuilder as DXB
+
+
+def test_scan():
+    assert scan(get_fixture('table_col_row_span.docx')) == DocumentMetrics(
+        num_paragraphs=25,
+        num_tables=2,
+        max_table_rows=5,
+        max_table_columns=4,
+        list_depth=0,
+        num_media=0,
+        media_bytes=0,
+    )
+    assert scan(get_fixture('headers.docx')).list_depth == 9
+    metrics = scan(get_fixture('has_image.docx'))
+    assert metrics.num_media == 1
+    assert metrics.media_bytes == 3840
+
+
+def test_scan_not_a_docx():
+    assert_raises(
+        MalformedDocx,
+        scan,
+        get_fixture('bullet_go_gray.png'),
+    )
+
+
+def test_metrics_match_scan():
+    for name in ('simple.docx', 'nested_tables.docx', 'has_image.docx'):
+        file_path = get_fixture(name)
+        zf = ZipFile(file_path)
+        try:
+            tree, meta_data, metrics = _get_document_data(
+                zf,
+                extract_media=False,
+                with_metrics=True,
+            )
+            html, html_metrics = create_html(
+                tree,
+                meta_data,
+                with_metrics=True,
+            )
+        finally:
+            zf.close()
+        assert metrics == html_metrics == scan(file_path), name
+        assert html
+
+
+def test_tree_metrics():
+    cells = [
+        DXB.tc(DXB.p_tag('AAA'), grid_span=2),
+        DXB.tc(DXB.p_tag('BBB')),
+    ]
+    nested_table = DXB.table_from_rows([DXB.tr(cells)])
+    body = ''.join([
+        DXB.li(text='AAA', ilvl=0, numId=1),
+        DXB.li(text='BBB', ilvl=2, numId=1),
+        # Numbering is turned off.
+        DXB.li(text='CCC', ilvl=5, numId=0),
+        DXB.table_from_rows([
+            DXB.tr([DXB.tc(nested_table)]),
+            DXB.tr([DXB.tc(DXB.p_tag('CCC'))]),
+        ]),
+    ])
+    metrics = get_tree_metrics(etree.fromstring(DXB.xml(body)), [10, 20])
+    assert metrics == DocumentMetrics(
+        num_paragraphs=6,
+        num_tables=2,
+        max_table_rows=2,
+        max_table_columns=3,
+        list_depth=3,
+        num_media=2,
+        media_bytes=30,
+    )
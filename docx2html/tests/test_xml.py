@@ -6,17 +6,28 @@ from copy import copy
 
 from docx2html.core import (
     DEFAULT_LIST_NUMBERING_STYLE,
+    MetaData,
+    STRICT_W_NAMESPACE,
+    W_NAMESPACE,
+    _classify_paragraph,
     _is_top_level_upper_roman,
+    classify_paragraphs,
     convert_image,
     create_html,
+    ensure_tag,
     get_font_size,
     get_image_id,
+    get_list_run,
     get_single_list_nodes_data,
     get_ordered_list_type,
     get_namespace,
     get_relationship_info,
     get_style_dict,
+    get_table_grid,
+    get_text_info,
     is_last_li,
+    serialize_html,
+    stream_html,
 )
 from docx2html.tests.document_builder import DocxBuilder as DXB
 from docx2html.tests import (
@@ -65,6 +76,16 @@ class SimpleListTestCase(_TranslationTestCase):
         li_data = get_single_list_nodes_data(first_p_tag, meta_data)
         assert len(list(li_data)) == 3
 
+    def test_get_list_run(self):
+        tree = self.get_xml()
+        meta_data = self.get_meta_data()
+        p_tags = tree.xpath('.//w:p', namespaces=tree.nsmap)
+
+        list_run = get_list_run(p_tags[0], meta_data)
+        self.assertEqual(list_run.numId, '1')
+        self.assertEqual(list_run.ilvl, 0)
+        self.assertEqual(list_run.nodes, p_tags)
+
     def test_is_last_li(self):
         tree = self.get_xml()
         meta_data = self.get_meta_data()
@@ -242,6 +263,40 @@ class RomanNumeralToHeadingTestCase(_TranslationTestCase):
             ]
         )
 
+    def test_classify_paragraphs(self):
+        tree = self.get_xml()
+        meta_data = classify_paragraphs(tree, self.get_meta_data())
+
+        result = [
+            (info.header, info.is_li, info.ilvl, info.numId)
+            for info in (
+                meta_data.paragraph_info[p]
+                for p in tree.xpath('.//w:p', namespaces=tree.nsmap)
+            )
+        ]
+        self.assertEqual(
+            result,
+            [
+                ('h2', False, 0, '1'),  # AAA
+                (False, True, 1, '1'),  # BBB
+                ('h2', False, 0, '1'),  # CCC
+                (False, True, 1, '1'),  # DDD
+                ('h2', False, 0, '1'),  # EEE
+                (False, True, 1, '1'),  # FFF
+                (False, True, 2, '1'),  # GGG
+            ]
+        )
+
+    def test_paragraphs_classified_once(self):
+        tree = self.get_xml()
+        meta_data = self.get_meta_data()
+        with mock.patch(
+                'docx2html.core._classify_paragraph',
+                wraps=_classify_paragraph,
+        ) as patched:
+            create_html(tree, meta_data)
+        self.assertEqual(patched.call_count, 7)
+
 
 class RomanNumeralToHeadingAllBoldTestCase(_TranslationTestCase):
     numbering_dict = {
@@ -547,6 +602,69 @@ class PictImageMissingIdTestCase(_TranslationTestCase):
         return etree.fromstring(xml)
 
 
+class TableRowAndColSpanTestCase(_TranslationTestCase):
+    expected_output = '''
+        <html>
+            <table>
+                <tr>
+                    <td rowspan="3">AAA</td>
+                    <td colspan="2">BBB</td>
+                </tr>
+                <tr>
+                    <td>CCC</td>
+                    <td rowspan="2">DDD</td>
+                </tr>
+                <tr>
+                    <td>EEE</td>
+                </tr>
+            </table>
+        </html>
+    '''
+
+    def get_xml(self):
+        rows = [
+            DXB.tr([
+                DXB.tc(DXB.p_tag('AAA'), v_merge='restart'),
+                DXB.tc(DXB.p_tag('BBB'), grid_span=2),
+            ]),
+            DXB.tr([
+                DXB.tc(DXB.p_tag(None), v_merge='continue'),
+                DXB.tc(DXB.p_tag('CCC')),
+                DXB.tc(DXB.p_tag('DDD'), v_merge='restart'),
+            ]),
+            DXB.tr([
+                DXB.tc(DXB.p_tag(None), v_merge='continue'),
+                DXB.tc(DXB.p_tag('EEE')),
+                DXB.tc(DXB.p_tag(None), v_merge='continue'),
+            ]),
+        ]
+        xml = DXB.xml(DXB.table_from_rows(rows))
+        return etree.fromstring(xml)
+
+    def test_get_table_grid(self):
+        tree = self.get_xml()
+        table = tree.find('%stbl' % get_namespace(tree, 'w'))
+        table_grid = get_table_grid(table)
+
+        result = [
+            table_grid[tc]
+            for tc in table.xpath('.//w:tc', namespaces=table.nsmap)
+        ]
+        self.assertEqual(
+            result,
+            [
+                (3, 1),  # AAA
+                (None, 2),  # BBB
+                (0, 1),
+                (None, 1),  # CCC
+                (2, 1),  # DDD
+                (0, 1),
+                (None, 1),  # EEE
+                (0, 1),
+            ]
+        )
+
+
 class TableWithInvalidTag(_TranslationTestCase):
     expected_output = '''
         <html>
@@ -676,6 +794,26 @@ class HyperlinkVanillaTestCase(_TranslationTestCase):
         return etree.fromstring(xml)
 
 
+class HyperlinkSpecialCharactersTestCase(_TranslationTestCase):
+    relationship_dict = {
+        'rId0': 'http://www.google.com/?a=1&b="2"',
+    }
+
+    expected_output = '''
+    <html>
+        <p><a href='http://www.google.com/?a=1&amp;b="2"'>a &amp; b</a></p>
+    </html>
+    '''
+
+    def get_xml(self):
+        run_tags = []
+        run_tags.append(DXB.r_tag('a &amp; b', is_bold=False))
+        run_tags = [DXB.hyperlink_tag(r_id='rId0', run_tags=run_tags)]
+        body = DXB.p_tag(run_tags)
+        xml = DXB.xml(body)
+        return etree.fromstring(xml)
+
+
 class HyperlinkWithBreakTestCase(_TranslationTestCase):
     relationship_dict = {
         'rId0': 'www.google.com',
@@ -892,3 +1030,171 @@ class RTagWithNoText(_TranslationTestCase):
 
         xml = DXB.xml(body)
         return etree.fromstring(xml)
+
+
+class LongBoldParagraphTestCase(_TranslationTestCase):
+    expected_output = '''
+    <html>
+        <h2>AAA BBB</h2>
+        <p><strong>one two three four five six seven eight nine</strong></p>
+        <p>   </p>
+    </html>
+    '''
+
+    def get_xml(self):
+        body = ''.join([
+            DXB.p_tag('AAA BBB', bold=True),
+            # Too many words to be a header.
+            DXB.p_tag(
+                'one two three four five six seven eight nine',
+                bold=True,
+            ),
+            DXB.p_tag('   '),
+        ])
+        xml = DXB.xml(body)
+        return etree.fromstring(xml)
+
+    def test_get_text_info(self):
+        tree = self.get_xml()
+        w_namespace = get_namespace(tree, 'w')
+        short, long_, empty = tree.findall('%sp' % w_namespace)
+        self.assertEqual(get_text_info(short, max_words=8), (2, True))
+        # Counting stops once there are too many words.
+        self.assertEqual(get_text_info(long_, max_words=8), (9, True))
+        self.assertEqual(get_text_info(long_), (9, True))
+        self.assertEqual(get_text_info(long_, max_words=2), (3, True))
+        self.assertEqual(get_text_info(empty, max_words=8), (4, False))
+
+
+def test_ensure_tag():
+    @ensure_tag(['p', 'tbl'])
+    def tag_name(el):
+        return el.tag.split('}')[-1]
+
+    tree = etree.fromstring(DXB.xml(DXB.p_tag('AAA')))
+    w_namespace = get_namespace(tree, 'w')
+    p = tree.find('%sp' % w_namespace)
+    r = p.find('%sr' % w_namespace)
+    assert tag_name(p) == 'p'
+    assert tag_name(r) is None
+    assert tag_name(None) is None
+    # The check is skipped.
+    assert tag_name.unchecked(r) == 'r'
+
+
+def test_strict_namespace():
+    # The same document in the Strict Open XML namespace, converted before
+    # and after the usual one.
+    body = ''.join([
+        DXB.p_tag('AAA', bold=True),
+        DXB.li(text='BBB', ilvl=0, numId=1),
+        DXB.li(text='CCC', ilvl=1, numId=1),
+        DXB.table(num_rows=2, num_columns=2, text=iter(
+            [DXB.p_tag('DDD')] * 4,
+        )),
+    ])
+    xml = DXB.xml(body)
+    strict_xml = xml.replace(W_NAMESPACE, STRICT_W_NAMESPACE)
+    assert strict_xml != xml
+
+    def get_html(xml):
+        meta_data = MetaData(
+            numbering_dict={'1': {0: 'decimal', 1: 'decimal'}},
+            relationship_dict={},
+            styles_dict={},
+            font_sizes_dict={},
+            image_handler=None,
+            image_sizes={},
+        )
+        return create_html(etree.fromstring(xml), meta_data)
+
+    strict_html = get_html(strict_xml)
+    html = get_html(xml)
+    assert strict_html == html
+    assert strict_html == get_html(strict_xml)
+    assert_html_equal(html, '''
+    <html>
+        <h2>AAA</h2>
+        <ol data-list-type="decimal">
+            <li>BBB<ol data-list-type="decimal"><li>CCC</li></ol></li>
+        </ol>
+        <table>
+            <tr><td>DDD</td><td>DDD</td></tr>
+            <tr><td>DDD</td><td>DDD</td></tr>
+        </table>
+    </html>
+    ''')
+
+
+def test_serialize_html_void_elements():
+    html = etree.Element('html')
+    p = etree.SubElement(html, 'p')
+    p.text = '<br> is escaped'
+    etree.SubElement(p, 'br')
+    for src in ('image(1)+[2]?.gif', 'image(1)+[2]?.gif', 'a"b>.gif'):
+        img = etree.SubElement(p, 'img')
+        img.set('src', src)
+        img.set('height', '20')
+    etree.SubElement(html, 'br').tail = 'AAA'
+    assert serialize_html(html) == (
+        '<html><p>&lt;br&gt; is escaped<br />'
+        '<img src="image(1)+[2]?.gif" height="20" />'
+        '<img src="image(1)+[2]?.gif" height="20" />'
+        '<img src=\'a"b&gt;.gif\' height="20" />'
+        '</p><br />AAA</html>'
+    )
+
+
+class _ChunkedReader(object):
+    """
+    A file that hands back ``chunk_size`` bytes of ``data`` for each read, no
+    matter how many were asked for.
+    """
+
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    def read(self, size=-1):
+        chunk = self.data[self.position:self.position + self.chunk_size]
+        self.position += len(chunk)
+        return chunk
+
+
+def test_stream_html_in_small_chunks():
+    # Where the reads of document.xml end must not change the html, even when
+    # the next child of the body has only been partly parsed.
+    body = ''.join([
+        DXB.li(text='AAA', ilvl=0, numId=1),
+        DXB.li(text='BBB', ilvl=1, numId=1),
+        DXB.p_tag('This paragraph has far too many words to be a header'),
+        DXB.li(text='CCC', ilvl=0, numId=1),
+        DXB.table(num_rows=2, num_columns=2, text=iter(
+            [DXB.li(text='DDD', ilvl=0, numId=1)] * 4,
+        )),
+        DXB.li(text='EEE', ilvl=0, numId=1),
+        DXB.p_tag('FFF', bold=True),
+    ])
+    xml = DXB.xml('<w:body>%s</w:body>' % body).encode('utf-8')
+
+    def get_meta_data():
+        return MetaData(
+            numbering_dict={'1': {0: 'decimal', 1: 'decimal'}},
+            relationship_dict={},
+            styles_dict={},
+            font_sizes_dict={},
+            image_handler=None,
+            image_sizes={},
+        )
+
+    expected_html = create_html(etree.fromstring(xml), get_meta_data())
+    for chunk_size in (1, 16, 64, 100, 256, len(xml)):
+        html_els = stream_html(
+            _ChunkedReader(xml, chunk_size),
+            get_meta_data(),
+        )
+        html = '<html>%s</html>' % ''.join(
+            serialize_html(html_el) for html_el in html_els
+        )
+        assert html == expected_html, chunk_size
@@ -0,0 +1,108 @@
+"""
+Timing the stages of a conversion.
+
+``convert`` takes a ``timing_hook``, a function that is called as each stage of
+the conversion finishes with the name of the stage, the wall and cpu time (in
+seconds) it took and how many things (elements, files, images) it went
+through::
+
+    def timing_hook(stage, wall_time, cpu_time, count):
+        ...
+
+``StageTimes`` is a hook that adds up the times for each stage.
+
+Some stages happen inside of others, images are converted while the html
+elements that hold them are built for example.
+"""
+import time
+
+
+class _Stage(object):
+    def __init__(self, timing_hook, stage):
+        self.timing_hook = timing_hook
+        self.stage = stage
+        self.count = 0
+
+    def __enter__(self):
+        self._wall_time = time.time()
+        self._cpu_time = time.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timing_hook(
+            self.stage,
+            time.time() - self._wall_time,
+            time.clock() - self._cpu_time,
+            self.count,
+        )
+
+
+class _NoStage(object):
+    count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NO_STAGE = _NoStage()
+
+
+def time_stage(timing_hook, stage):
+    """
+    Returns a context manager that times ``stage`` for ``timing_hook``. Set
+    ``count`` on it to report how many things the stage went through. If
+    ``timing_hook`` is None it does nothing.
+    """
+    if timing_hook is None:
+        return _NO_STAGE
+    return _Stage(timing_hook, stage)
+
+
+class StageTimes(object):
+    """
+    A ``timing_hook`` that adds up the wall time, cpu time and count for each
+    stage in ``stages``. ``order`` has the stages in the order they were first
+    seen.
+
+    >>> times = StageTimes()
+    >>> times('parse', 0.5, 0.25, 10)
+    >>> times('parse', 0.5, 0.25, 5)
+    >>> times('images', 0.5, 0.25, 1)
+    >>> times.order
+    ['parse', 'images']
+    >>> sorted(times.stages['parse'].items())
+    [('calls', 2), ('count', 15), ('cpu_time', 0.5), ('wall_time', 1.0)]
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.order = []
+
+    def __call__(self, stage, wall_time, cpu_time, count):
+        if stage not in self.stages:
+            self.order.append(stage)
+            self.stages[stage] = {
+                'wall_time': 0.0,
+                'cpu_time': 0.0,
+                'count': 0,
+                'calls': 0,
+            }
+        totals = self.stages[stage]
+        totals['wall_time'] += wall_time
+        totals['cpu_time'] += cpu_time
+        totals['count'] += count
+        totals['calls'] += 1
+
+    def __str__(self):
+        lines = ['%-16s %10s %10s %8s' % ('stage', 'wall', 'cpu', 'count')]
+        for stage in self.order:
+            totals = self.stages[stage]
+            lines.append('%-16s %9.2fms %9.2fms %8d' % (
+                stage,
+                totals['wall_time'] * 1000,
+                totals['cpu_time'] * 1000,
+                totals['count'],
+            ))
+        return '\n'.join(lines)